@@ -0,0 +1,50 @@
+"""Micro-benchmark of the lat/lng split on the stream ingest path.
+
+Run from the repository root: `uv run python -m benchmarks.latlng`
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from utils.stream_store import parse_latlng
+
+N_SAMPLES = 10_000
+N_RUNS = 20
+
+
+def _legacy_parse_latlng(df: pd.DataFrame) -> pd.DataFrame:
+    return df.join(
+        df.latlng.apply(pd.Series).rename(columns={0: "latitude", 1: "longitude"})
+    ).drop(columns=["latlng"])
+
+
+def _get_activity_df(n_samples: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed=0)
+    latlng = np.cumsum(rng.normal(scale=1e-5, size=(n_samples, 2)), axis=0) + [
+        48.85,
+        2.35,
+    ]
+
+    return pd.DataFrame(
+        {"time": np.arange(n_samples), "latlng": latlng.round(6).tolist()}
+    )
+
+
+def main() -> None:
+    df = _get_activity_df(N_SAMPLES)
+    df_with_malformed = df.assign(
+        latlng=lambda df: df.latlng.mask(df.index % 1000 == 0, None)
+    )
+
+    for label, func, data in [
+        ("legacy apply(pd.Series)", _legacy_parse_latlng, df),
+        ("vectorized", parse_latlng, df),
+        ("vectorized, 0.1% malformed", parse_latlng, df_with_malformed),
+    ]:
+        duration = min(timeit.repeat(lambda: func(data), number=1, repeat=N_RUNS))
+        print(f"{label:>28}: {duration * 1000:8.2f} ms / {N_SAMPLES} samples")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""Benchmarks data loading and pages computations, headless, on synthetic histories.
+
+Run from the repository root: `uv run python -m benchmarks.run`
+
+Each stage reports its best wall time over a few runs and its peak traced memory,
+and is compared against benchmarks/baseline.json: the exit code is 1 when a stage
+regressed by more than the tolerance. `--save-baseline` overwrites the baseline.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+import pandas as pd
+
+from utils.aggregations import get_speed_range_totals, get_zone_totals
+from utils.burnup import get_burn_up_df
+from utils.activity_store import ACTIVITIES_FILEPATH
+from utils.data_cache import (
+    create_best_efforts_data,
+    create_materialized_data,
+    create_queried_data,
+)
+from utils.query_engine import duckdb
+from utils.rollups import get_daily_totals, get_daily_zone_totals, roll_up
+from utils.stream_store import (
+    STREAMS_SNAPSHOT_FILEPATH,
+    get_streams_file,
+    write_activity_streams,
+)
+from utils.synthetic import generate_activities, generate_streams_df
+from utils.targets import DEFAULT_TARGETS
+
+BENCHMARKS_PATH = Path(__file__).parent.resolve()
+DATASETS_PATH = BENCHMARKS_PATH / ".data"
+BASELINE_FILEPATH = BENCHMARKS_PATH / "baseline.json"
+
+SIZES = [100, 1000, 5000]
+RUNS_PER_WEEK = 5
+N_NEW_ACTIVITIES = 3  # downloaded by a sync, for reload_new_activities
+NOISE_FLOOR_S = 0.005  # regressions smaller than these are ignored
+NOISE_FLOOR_MB = 0.1
+
+ACTIVITY_COLUMNS = [
+    "id",
+    "average_cadence",
+    "average_heartrate",
+    "average_speed",
+    "description",
+    "distance",
+    "elapsed_time",
+    "kudos_count",
+    "max_heartrate",
+    "moving_time",
+    "name",
+    "start_date",
+]
+
+Context = dict[str, Any]
+Stage = Callable[[Context], Any]
+
+
+# ------ Synthetic cache, written once per size in benchmarks/.data/<size>/cache
+def _prepare_dataset(n_activities: int) -> Path:
+    dataset_path = DATASETS_PATH / str(n_activities)
+    dataset_path.mkdir(parents=True, exist_ok=True)
+    os.chdir(dataset_path)
+
+    if not ACTIVITIES_FILEPATH.exists():
+        print(f"Generating {n_activities} synthetic activities ...", file=sys.stderr)
+        activities = generate_activities(
+            n_years=n_activities / (52 * RUNS_PER_WEEK),
+            runs_per_week=RUNS_PER_WEEK,
+            end_date=datetime.date(2025, 12, 31),
+        )
+        for activity in activities:
+            write_activity_streams(
+                generate_streams_df(activity), activity_id=activity["id"]
+            )
+        # Written last, as syncs do
+        pd.DataFrame(activities).assign(description=None).filter(
+            items=ACTIVITY_COLUMNS
+        ).to_csv(ACTIVITIES_FILEPATH)
+
+    return dataset_path
+
+
+# ------ Stages, run in order: later stages use what earlier ones put in context
+def _materialize(context: Context) -> None:
+    materialized_data = create_materialized_data()
+    context["activities_df"], context["streams_df"] = materialized_data.refresh()
+    context["activity_zone_totals_df"] = materialized_data.activity_zone_totals
+    context["speed_histogram"] = materialized_data.speed_histogram
+    context["materialized_data"] = materialized_data
+
+
+def _load_activities(context: Context) -> None:
+    """Activities only, as the pages that do not need streams do on a first start"""
+    create_materialized_data().refresh_activities()
+
+
+def _load(context: Context) -> None:
+    """From the stream files only, as on a first start"""
+    STREAMS_SNAPSHOT_FILEPATH.unlink(missing_ok=True)
+    _materialize(context)
+    context["materialized_data"].write_snapshot()
+
+
+def _load_snapshot(context: Context) -> None:
+    """From the memory-mapped snapshot left by the previous load"""
+    _materialize(context)
+
+
+def _reload(context: Context) -> None:
+    context["materialized_data"].refresh()
+
+
+def _download_new_activities(context: Context) -> None:
+    """Adds activities after the last one, as a sync does"""
+    activities_df = pd.read_csv(ACTIVITIES_FILEPATH, index_col=0)
+    new_activities = generate_activities(
+        n_years=N_NEW_ACTIVITIES / (52 * RUNS_PER_WEEK),
+        runs_per_week=RUNS_PER_WEEK,
+        end_date=datetime.date(2026, 1, 7),  # the week after the dataset ends
+    )
+    for i, activity in enumerate(new_activities, start=1):
+        activity["id"] = int(activities_df.id.max()) + i
+        write_activity_streams(
+            generate_streams_df(activity), activity_id=activity["id"]
+        )
+
+    context["activities_csv"] = ACTIVITIES_FILEPATH.read_bytes()
+    context["new_activity_ids"] = [activity["id"] for activity in new_activities]
+    pd.concat(
+        [
+            activities_df,
+            pd.DataFrame(new_activities)
+            .assign(description=None)
+            .filter(items=ACTIVITY_COLUMNS),
+        ],
+        ignore_index=True,
+    ).to_csv(ACTIVITIES_FILEPATH)
+
+
+def _remove_new_activities(context: Context) -> None:
+    ACTIVITIES_FILEPATH.write_bytes(context.pop("activities_csv"))
+    for activity_id in context.pop("new_activity_ids"):
+        get_streams_file(activity_id).unlink()
+    context["materialized_data"].refresh()
+
+
+def _reload_new_activities(context: Context) -> None:
+    """After a sync downloaded a few new activities, as a page sees it"""
+    context["materialized_data"].refresh()
+
+
+def _single_activity_streams(context: Context) -> pd.DataFrame:
+    return context["materialized_data"].get_activity_streams(
+        context["activities_df"].id.iloc[-1]
+    )
+
+
+def _zone_totals(context: Context) -> pd.DataFrame:
+    return get_zone_totals(
+        context["activities_df"],
+        context["activity_zone_totals_df"],
+        pd.Grouper(key="start_date", freq="W-SUN"),
+    )
+
+
+def _zone_rollups(context: Context) -> list[pd.DataFrame]:
+    """Daily zone totals, rolled up to each period the pages offer"""
+    daily_zone_totals_df = get_daily_zone_totals(
+        context["activities_df"], context["activity_zone_totals_df"]
+    )
+
+    return [
+        roll_up(
+            daily_zone_totals_df,
+            pd.Grouper(key="start_date", freq=freq),
+            by=["speed_zone"],
+        )
+        for freq in ["D", "W-SUN", "M", "Q", "Y"]
+    ]
+
+
+def _speed_range_totals(context: Context) -> pd.DataFrame:
+    return get_speed_range_totals(
+        context["activities_df"],
+        context["speed_histogram"],
+        pd.Grouper(key="start_date", freq="W-SUN"),
+        min_speed=1000 / (5 * 60),
+        max_speed=1000 / (4 * 60),
+    )
+
+
+def _burn_up(context: Context) -> pd.DataFrame:
+    """Every default target at once, from the daily totals"""
+    return get_burn_up_df(get_daily_totals(context["activities_df"]), DEFAULT_TARGETS)
+
+
+def _best_efforts(context: Context) -> None:
+    """From the metadata of the stream files, as on a first start"""
+    create_best_efforts_data().refresh(context["activities_df"])
+
+
+def _query(context: Context) -> None:
+    """Zone totals and speed histograms from the stream files, with DuckDB"""
+    create_queried_data().refresh(context["activities_df"])
+
+
+STAGES: dict[str, Stage] = {
+    "load_activities": _load_activities,
+    "load": _load,
+    "load_snapshot": _load_snapshot,
+    "reload": _reload,
+    "reload_new_activities": _reload_new_activities,
+    "single_activity_streams": _single_activity_streams,
+    "zone_totals": _zone_totals,
+    "zone_rollups": _zone_rollups,
+    "speed_range_totals": _speed_range_totals,
+    "burn_up": _burn_up,
+    "best_efforts": _best_efforts,
+}
+if duckdb is not None:  # optional backend
+    STAGES["query"] = _query
+
+# Run around each measure of a stage, untimed: (setup, teardown)
+STAGE_FIXTURES: dict[str, tuple[Stage, Stage]] = {
+    "reload_new_activities": (_download_new_activities, _remove_new_activities),
+}
+
+
+# ------ Measures
+def _measure(
+    stage: Stage,
+    context: Context,
+    repeat: int,
+    fixture: tuple[Stage, Stage] | None = None,
+) -> dict[str, float]:
+    setup, teardown = fixture or (lambda _: None, lambda _: None)
+
+    wall_times_s = []
+    for _ in range(repeat):
+        setup(context)
+        start = time.perf_counter()
+        stage(context)
+        wall_times_s.append(time.perf_counter() - start)
+        teardown(context)
+
+    # Tracing slows things down: memory is measured on a separate run
+    setup(context)
+    tracemalloc.start()
+    stage(context)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    teardown(context)
+
+    return {
+        "wall_time_s": round(min(wall_times_s), 4),
+        "peak_memory_mb": round(peak_memory / 2**20, 2),
+    }
+
+
+def _get_regressions(
+    results: dict[str, dict[str, dict[str, float]]],
+    baseline: dict[str, dict[str, dict[str, float]]],
+    tolerance: float,
+) -> list[str]:
+    regressions = []
+    for size, stages in results.items():
+        for stage, measures in stages.items():
+            reference = baseline.get(size, {}).get(stage)
+            if reference is None:
+                continue
+
+            wall_time_s, reference_wall_time_s = (
+                measures["wall_time_s"],
+                reference["wall_time_s"],
+            )
+            if (
+                wall_time_s > reference_wall_time_s * (1 + tolerance)
+                and wall_time_s - reference_wall_time_s > NOISE_FLOOR_S
+            ):
+                regressions.append(
+                    f"{size}/{stage}: {wall_time_s:.4f}s vs {reference_wall_time_s:.4f}s"
+                )
+            peak_memory_mb, reference_peak_memory_mb = (
+                measures["peak_memory_mb"],
+                reference["peak_memory_mb"],
+            )
+            if (
+                peak_memory_mb > reference_peak_memory_mb * (1 + tolerance)
+                and peak_memory_mb - reference_peak_memory_mb > NOISE_FLOOR_MB
+            ):
+                regressions.append(
+                    f"{size}/{stage}: {peak_memory_mb:.2f}MB "
+                    f"vs {reference_peak_memory_mb:.2f}MB"
+                )
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILEPATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+    args.baseline = args.baseline.resolve()  # datasets are run from their own dir
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    results: dict[str, dict[str, dict[str, float]]] = {}
+
+    for size in args.sizes:
+        _prepare_dataset(size)
+        context: Context = {}
+        results[str(size)] = {}
+
+        for stage in STAGES:
+            if stage not in args.stages:
+                STAGES[stage](context)  # still needed by later stages
+                continue
+
+            measures = _measure(
+                STAGES[stage],
+                context,
+                repeat=args.repeat,
+                fixture=STAGE_FIXTURES.get(stage),
+            )
+            results[str(size)][stage] = measures
+
+            reference = baseline.get(str(size), {}).get(stage)
+            print(
+                f"{size:>6} {stage:<24} {measures['wall_time_s']:>9.4f}s "
+                f"{measures['peak_memory_mb']:>9.2f}MB"
+                + (
+                    f"   (baseline {reference['wall_time_s']:.4f}s "
+                    f"{reference['peak_memory_mb']:.2f}MB)"
+                    if reference
+                    else ""
+                )
+            )
+
+    if args.save_baseline:
+        args.baseline.write_text(
+            json.dumps(
+                {
+                    **baseline,
+                    **{
+                        size: {**baseline.get(size, {}), **stages}
+                        for size, stages in results.items()
+                    },
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    regressions = _get_regressions(results, baseline, tolerance=args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,12 @@
+import os
 from pathlib import Path
 import yaml
 
 # ------ Data
 DATA_PATH = Path("./cache")
-DOWNLOAD_LIMIT = 50
+DOWNLOAD_MAX_WORKERS = 4
+# "pandas" materializes streams in memory, "duckdb" queries the stream files instead
+QUERY_BACKEND = os.environ.get("STRAVA_QUERY_BACKEND", "pandas")
 STRAVA_PARAMS_FILE = "strava.yaml"
 
 with open(STRAVA_PARAMS_FILE) as f:
@@ -13,9 +16,14 @@ STRAVA_CLIENT_ID = STRAVA_PARAMS["client_id"]
 STRAVA_CLIENT_SECRET = STRAVA_PARAMS["client_secret"]
 STRAVA_FIRST_ACTIVITY_START_DATE = "2021-01-01T00:00:00Z"
 STRAVA_RUN_SPORT_TYPES = ["Run", "TrailRun"]
+# Incremental syncs only list new activities, full ones catch edits and deletions
+STRAVA_FULL_SYNC_INTERVAL_DAYS = 7
+# Years of synthetic history served by a local fake of the Strava API, 0 = disabled
+STRAVA_FAKE_API_YEARS = float(os.environ.get("STRAVA_FAKE_API_YEARS", 0))
 STRAVA_STREAM_TYPES = [
     "time",
     "heartrate",
+    "cadence",
     "velocity_smooth",
     "altitude",
     "latlng",
@@ -1,54 +1,67 @@
 import altair as alt
 import streamlit as st
 
-from utils.data_cache import load_data_from_cache
+from utils.charts import st_memoized_altair_chart
+from utils.data_cache import (
+    get_cache_data_version,
+    load_activities_from_cache,
+    load_daily_totals_from_cache,
+)
 from utils.data import get_temporal_grouper, stop_if_no_activities
+from utils.rollups import roll_up
+from utils.sync_worker import st_sync_status
 
 
-activities_df, streams_df = load_data_from_cache()
+activities_df = load_activities_from_cache()
 stop_if_no_activities(activities_df)
 
 with st.sidebar:
     pd_grouper, _ = get_temporal_grouper(key="global-volume")
 
-data = (
-    activities_df.filter(items=["start_date", "distance"])
-    .groupby(pd_grouper)
-    .sum()
-    .reset_index()
-)
-bar = (
-    alt.Chart(data)
-    .mark_bar()
-    .encode(
-        x="start_date:T",
-        y="distance:Q",
-    )
-)
-line = (
-    alt.Chart(data)
-    .mark_line(color="red")
-    .transform_window(
-        rolling_mean="mean(distance)",
-        frame=[-9, 0],
+# Periods are rolled up from the daily totals, once for the charts below
+period_totals_df = roll_up(load_daily_totals_from_cache(), pd_grouper)
+
+
+# ---- global, volume and its rolling mean
+def build_chart() -> alt.TopLevelMixin:
+    data = period_totals_df.filter(items=["start_date", "distance"])
+    bar = (
+        alt.Chart(data)
+        .mark_bar()
+        .encode(
+            x="start_date:T",
+            y="distance:Q",
+        )
     )
-    .encode(
-        x="start_date:T",
-        y="rolling_mean:Q",
+    line = (
+        alt.Chart(data)
+        .mark_line(color="red")
+        .transform_window(
+            rolling_mean="mean(distance)",
+            frame=[-9, 0],
+        )
+        .encode(
+            x="start_date:T",
+            y="rolling_mean:Q",
+        )
     )
-)
-st.altair_chart(bar + line, use_container_width=True)
 
-grouped_distances = (
-    activities_df.filter(items=["start_date", "distance"]).groupby(pd_grouper).sum()
+    return bar + line
+
+
+st_memoized_altair_chart(
+    key=("global", get_cache_data_version(), pd_grouper.freq),
+    build_chart=build_chart,
 )
+
+grouped_distances = period_totals_df.set_index("start_date")
 st.bar_chart(grouped_distances, y="distance")
 
 # ---- global, mean speed week
-grouped_average_speed = (
-    activities_df.filter(items=["start_date", "distance", "moving_time"])
-    .groupby(pd_grouper)
-    .sum()
-    .assign(average_speed_kmh=lambda df: df.distance / df.moving_time * 3.6)
+grouped_average_speed = grouped_distances.assign(
+    average_speed_kmh=lambda df: df.distance / df.moving_time * 3.6
 )
 st.bar_chart(grouped_average_speed, y="average_speed_kmh")
+
+with st.sidebar:
+    st_sync_status()
@@ -1,14 +1,20 @@
 import altair as alt
 import streamlit as st
 
-from utils.data import stop_if_no_activities
-from utils.data_cache import load_data_from_cache
+from utils.data import st_smoothing_selector, stop_if_no_activities
+from utils.data_cache import (
+    load_activity_streams_from_cache,
+    load_activities_from_cache,
+    load_smoothed_streams_from_cache,
+)
+from utils.downsampling import downsample, get_route_indices
+from utils.sync_worker import st_sync_status
 
 DISTANCE_KM = "Distance (km)"
 TIME_S = "Time (s)"
-N_POINTS = 500  # for sampling
+N_POINTS = 500  # for sampling, per series
 
-activities_df, streams_df = load_data_from_cache()
+activities_df = load_activities_from_cache()
 stop_if_no_activities(activities_df)
 
 with st.sidebar:
@@ -25,23 +31,36 @@ with st.sidebar:
         DISTANCE_KM: "distance_km",
     }[selected_x_unit_label]
 
-    rolling_window = st.slider(
-        label="Smooth span", value=10, min_value=1, max_value=100
+    smoothing_window, smoothing_method = st_smoothing_selector()
+    n_points = st.select_slider(
+        label="Chart points", options=[250, N_POINTS, 1000, 2000], value=N_POINTS
     )
 
 
 selected_activity = activities_df.loc[selected_activity_idx]
-selected_activity_streams = streams_df.loc[
-    lambda df: df.activity_id == selected_activity.id
-].assign(
+selected_activity_streams = load_activity_streams_from_cache(
+    selected_activity.id
+).assign(
     distance_km=lambda df: df.distance / 1000,
-    speed_ms=lambda df: df.velocity_smooth.rolling(
-        window=rolling_window, center=True, min_periods=1
-    ).mean(),
+    speed_ms=load_smoothed_streams_from_cache(
+        selected_activity.id,
+        "velocity_smooth",
+        window=smoothing_window,
+        method=smoothing_method,
+    ),
     speed_kmh=lambda df: df.speed_ms * 3.6,
 )
-sampled_selected_activity_streams = selected_activity_streams.iloc[
-    :: max(len(selected_activity_streams) // N_POINTS, 1)
+sampled_selected_activity_streams = downsample(
+    selected_activity_streams,
+    x=selected_x_unit_col,
+    columns=["speed_kmh", "heartrate", "altitude"],
+    n_out=n_points,
+)
+route_df = selected_activity_streams.filter(items=["latitude", "longitude"]).dropna()
+sampled_route_df = route_df.iloc[
+    get_route_indices(
+        route_df.latitude.to_numpy(), route_df.longitude.to_numpy(), n_out=n_points
+    )
 ]
 
 st.write(
@@ -135,10 +154,7 @@ chart = (
 ).interactive(bind_y=False)
 
 st.altair_chart(chart, use_container_width=True)
-st.map(
-    sampled_selected_activity_streams.filter(items=["latitude", "longitude"]).dropna(),
-    size=1,
-)
+st.map(sampled_route_df, size=1)
 
 st.write("---")
 col_a, col_b = st.columns(2)
@@ -161,3 +177,6 @@ st.write(
     f"N data points for activity (after sub-sampling): {len(sampled_selected_activity_streams)}"
 )
 st.write(selected_activity)
+
+with st.sidebar:
+    st_sync_status()
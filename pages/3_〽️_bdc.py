@@ -4,59 +4,31 @@ import altair as alt
 import pandas as pd
 import streamlit as st
 
+from utils.burnup import get_burn_up_df
+from utils.charts import get_memoized, st_memoized_altair_chart
 from utils.data import stop_if_no_activities
-from utils.data_cache import load_data_from_cache
+from utils.data_cache import (
+    get_cache_data_version,
+    load_activities_from_cache,
+    load_daily_totals_from_cache,
+)
+from utils.sync_worker import st_sync_status
+from utils.targets import load_targets, save_targets
 
-POSITIVE_COLOR = "darkseagreen"
-NEGATIVE_COLOR = "indianred"
 TARGET_COLOR = "orange"
+TODAY = datetime.datetime.now().date()  # days after are not counted yet
 
-AVAILABLE_TARGETS = {
-    "2025": {
-        "target_km": 4000,
-        "start_date": datetime.date(2025, 1, 1),
-        "end_date": datetime.date(2025, 12, 31),
-        "exclude": [],
-    },
-    "2024": {
-        "target_km": 2200,
-        "start_date": datetime.date(2024, 1, 1),
-        "end_date": datetime.date(2024, 12, 31),
-        "exclude": [
-            {
-                "start_date": datetime.date(2024, 1, 29),
-                "end_date": datetime.date(2024, 3, 1),
-            },
-            {
-                "start_date": datetime.date(2024, 6, 1),
-                "end_date": datetime.date(2024, 7, 1),
-            },
-        ],
-    },
-    "2023": {
-        "target_km": 2600,
-        "start_date": datetime.date(2023, 1, 1),
-        "end_date": datetime.date(2023, 12, 31),
-        "exclude": [
-            {
-                "start_date": datetime.date(2023, 7, 31),
-                "end_date": datetime.date(2023, 8, 20),
-            },
-        ],
-    },
-}
-
-activities_df, streams_df = load_data_from_cache()
+activities_df = load_activities_from_cache()
 stop_if_no_activities(activities_df)
+targets = load_targets()
 
 with st.sidebar:
-    target_label = st.selectbox(label="Select target", options=AVAILABLE_TARGETS.keys())
+    target_label = st.selectbox(label="Select target", options=targets.keys())
 
-    target = AVAILABLE_TARGETS[target_label]
+    target = targets[target_label]
     start_date = target["start_date"]
     end_date = target["end_date"]
     target_km = target["target_km"]
-    exclude_list = target["exclude"]
 
     st.write(
         f"""---
@@ -66,50 +38,66 @@ with st.sidebar:
 - 7️⃣ {target_km/365*7:.2f} km weekly"""
     )
 
-# %% Format data with pandas
-date_range_index = pd.date_range(
-    start=start_date,
-    end=end_date,
-    freq="D",
-)
-date_range_serie = pd.Series(index=date_range_index, data=date_range_index).dt.date
-is_day_active = pd.Series(index=date_range_index, data=True)
-for exclusion_period in exclude_list:
-    is_day_active = is_day_active & (
-        (date_range_serie < exclusion_period["start_date"])
-        | (date_range_serie > exclusion_period["end_date"])
-    )
-target_km_day = target_km / is_day_active.sum()
-
-date_range_df = pd.DataFrame(index=date_range_index).assign(
-    target_km_day=is_day_active * target_km_day
-)
-
-target_bdc_df = (
-    date_range_df.join(
-        activities_df.assign(start_date=lambda df: df.start_date.dt.date)
-        .groupby("start_date")
-        .distance.sum()
-    )
-    .reset_index(names="date")
-    .assign(
-        distance=lambda df: df.distance.fillna(0).mask(
-            df["date"].dt.date > datetime.datetime.now().date()
-        ),
-        cum_distance=lambda df: df.distance.cumsum() / 1000,
-        cum_target=lambda df: df.target_km_day.cumsum(),
-        delta=lambda df: (df.cum_distance - df.cum_target),
-        delta_color=lambda df: df.delta.map(
-            lambda x: POSITIVE_COLOR if x >= 0 else NEGATIVE_COLOR
-        ),
-        tooltip_distance=lambda df: df.cum_distance.map(lambda x: f"{x:.2f} km"),
-        tooltip_target=lambda df: df.cum_target.map(lambda x: f"{x:.2f} km"),
-        tooltip_delta=lambda df: df.delta.map(lambda x: f"{x:.2f} km"),
-        tooltip_percent_target=lambda df: df.cum_distance.map(
-            lambda x: f"{x / target_km * 100:.2f} %"
-        ),
-    )
+    # %% Targets, saved in the cache folder: a label already used is replaced
+    with st.expander("Add or edit a target"):
+        with st.form("target"):
+            edited_label = st.text_input(label="Label", value=target_label)
+            edited_target_km = st.number_input(
+                label="Distance (km)", min_value=1, value=int(target_km), step=100
+            )
+            edited_dates = st.date_input(label="Period", value=(start_date, end_date))
+            edited_exclusions_df = st.data_editor(
+                pd.DataFrame(
+                    target.get("exclude") or [], columns=["start_date", "end_date"]
+                ),
+                num_rows="dynamic",
+                column_config={
+                    "start_date": st.column_config.DateColumn("Excluded from"),
+                    "end_date": st.column_config.DateColumn("to"),
+                },
+                hide_index=True,
+            )
+            if st.form_submit_button("Save target"):
+                if not edited_label or len(edited_dates) != 2:
+                    st.error("A target needs a label and a period")
+                else:
+                    save_targets(
+                        {
+                            **targets,
+                            edited_label: {
+                                "target_km": edited_target_km,
+                                "start_date": edited_dates[0],
+                                "end_date": edited_dates[1],
+                                "exclude": [
+                                    {
+                                        "start_date": pd.Timestamp(
+                                            row.start_date
+                                        ).date(),
+                                        "end_date": pd.Timestamp(row.end_date).date(),
+                                    }
+                                    for row in edited_exclusions_df.dropna().itertuples()
+                                ],
+                            },
+                        }
+                    )
+                    st.rerun()
+
+        if st.button(f"Delete target {target_label}", disabled=len(targets) == 1):
+            save_targets(
+                {
+                    label: target
+                    for label, target in targets.items()
+                    if label != target_label
+                }
+            )
+            st.rerun()
+
+# %% Format data with pandas, every target at once
+burn_up_df = get_memoized(
+    key=("burn_up_df", get_cache_data_version(), repr(targets), TODAY),
+    compute=lambda: get_burn_up_df(load_daily_totals_from_cache(), targets),
 )
+target_bdc_df = burn_up_df.loc[burn_up_df.target == target_label]
 
 # %% Progress bar
 total_km = target_bdc_df.distance.sum() / 1000
@@ -123,106 +111,120 @@ st.progress(
     text=f"{status_emojy} {100 * percentage_progress:.2f}% ({total_km:.2f}km / {target_km:.2f}km)",
     value=min(1.0, percentage_progress),
 )
-nb_days_since_beginning = (datetime.datetime.now().date() - start_date).days
+nb_days_since_beginning = (TODAY - start_date).days
 with st.sidebar:
-    st.write(
-        f"""---
-- {nb_days_since_beginning} days since begining
-- 1️⃣ {total_km/nb_days_since_beginning:.2f} km daily
-- 7️⃣ {total_km/nb_days_since_beginning*7:.2f} km weekly"""
+    if nb_days_since_beginning < 0:
+        st.write(f"---\n- Starts in {-nb_days_since_beginning} days")
+    else:
+        # Today counts, not to divide by 0 on the first day
+        nb_days_run = max(nb_days_since_beginning, 1)
+        st.write(
+            f"""---
+- {nb_days_since_beginning} days since beginning
+- 1️⃣ {total_km/nb_days_run:.2f} km daily
+- 7️⃣ {total_km/nb_days_run*7:.2f} km weekly"""
+        )
+
+
+# %% Chart, only built again when the data or the target changes
+def build_chart() -> alt.TopLevelMixin:
+    end_date_plus_1 = end_date + datetime.timedelta(days=1)
+    x_axis_domain = [
+        {"year": start_date.year, "month": start_date.month, "date": start_date.day},
+        {
+            "year": end_date_plus_1.year,
+            "month": end_date_plus_1.month,
+            "date": end_date_plus_1.day,
+        },
+    ]
+    date_x_axis = alt.X(
+        "date:T",
+        scale=alt.Scale(domain=x_axis_domain),
+        title="Date",
     )
 
+    base = alt.Chart(target_bdc_df).encode(
+        x=date_x_axis.title("").axis(labels=False, grid=True),
+        tooltip=[
+            alt.Tooltip("date:T", title="Date"),
+            alt.Tooltip("cum_distance:Q", title="Realized (km)", format=".2f"),
+            alt.Tooltip("cum_target:Q", title="Planned (km)", format=".2f"),
+            alt.Tooltip("delta:Q", title="Δ (km)", format=".2f"),
+            alt.Tooltip("percent_target:Q", title="% Target", format=".2%"),
+        ],
+    )
 
-# %% Graph
-end_date_plus_1 = end_date + datetime.timedelta(days=1)
-x_axis_domain = [
-    {"year": start_date.year, "month": start_date.month, "date": start_date.day},
-    {
-        "year": end_date_plus_1.year,
-        "month": end_date_plus_1.month,
-        "date": end_date_plus_1.day,
-    },
-]
-date_x_axis = alt.X(
-    "date:T",
-    scale=alt.Scale(domain=x_axis_domain),
-    title="Date",
-)
+    # %% Sub charts
+    realized_chart = base.mark_area(line=True, interpolate="linear").encode(
+        y=alt.Y("cum_distance:Q").title("Distance (km)")
+    )
 
-base = alt.Chart(target_bdc_df).encode(
-    x=date_x_axis.title("").axis(labels=False, grid=True),
-    tooltip=[
-        alt.Tooltip("date:T", title="Date"),
-        alt.Tooltip("tooltip_distance:N", title="Realized"),
-        alt.Tooltip("tooltip_target:N", title="Planned"),
-        alt.Tooltip("tooltip_delta:N", title="Δ"),
-        alt.Tooltip("tooltip_percent_target:N", title="% Target"),
-    ],
-)
+    target_chart = base.mark_line(color=TARGET_COLOR).encode(
+        y=alt.Y("cum_target:Q").title("")
+    )
 
-# %% Sub charts
-realized_chart = base.mark_area(line=True, interpolate="linear").encode(
-    y=alt.Y("cum_distance:Q").title("Distance (km)")
-)
+    delta_chart = base.mark_area(interpolate="linear").encode(
+        x=date_x_axis.axis(labels=True, grid=True),
+        y=alt.Y("delta:Q").title("Δ (km)"),
+        fill=alt.Color("delta_color:N", scale=None),
+    )
 
-target_chart = base.mark_line(color=TARGET_COLOR).encode(
-    y=alt.Y("cum_target:Q").title("")
-)
+    # %% Vertical line selector
+    nearest = alt.selection_point(
+        nearest=True,
+        on="mouseover",
+        fields=["date"],
+        empty=False,
+    )
+    selectors = base.mark_point().encode(opacity=alt.value(0)).add_params(nearest)
 
-delta_chart = base.mark_area(interpolate="linear").encode(
-    x=date_x_axis.axis(labels=True, grid=True),
-    y=alt.Y("delta:Q").title("Δ (km)"),
-    fill=alt.Color("delta_color:N", scale=None),
-)
+    vertical_line_rule = (
+        base.mark_rule(strokeWidth=6)
+        .encode(color=alt.Color("delta_color:N", scale=None))
+        .transform_filter(nearest)
+    )
 
-# %% Vertical line selector
-nearest = alt.selection_point(
-    nearest=True,
-    on="mouseover",
-    fields=["date"],
-    empty=False,
-)
-selectors = base.mark_point().encode(opacity=alt.value(0)).add_params(nearest)
+    realized_circle = realized_chart.mark_circle(
+        opacity=1, size=80, color="white"
+    ).transform_filter(nearest)
+    realized_point = realized_chart.mark_point(
+        opacity=1, size=80, strokeWidth=3
+    ).transform_filter(nearest)
+    target_circle = target_chart.mark_circle(
+        opacity=1, size=80, color="white"
+    ).transform_filter(nearest)
+    target_point = target_chart.mark_point(
+        color=TARGET_COLOR, opacity=1, size=80, strokeWidth=3
+    ).transform_filter(nearest)
+
+    vertical_line_selection = (
+        selectors
+        + vertical_line_rule
+        + realized_circle
+        + realized_point
+        + target_circle
+        + target_point
+    )
 
-vertical_line_rule = (
-    base.mark_rule(strokeWidth=6)
-    .encode(color=alt.Color("delta_color:N", scale=None))
-    .transform_filter(nearest)
-)
+    # %% Final and rendering
+    top_chart = (realized_chart + target_chart + vertical_line_selection).properties(
+        width=900, height=340
+    )
+    bottom_chart = (delta_chart + vertical_line_rule).properties(width=900, height=90)
 
-realized_circle = realized_chart.mark_circle(
-    opacity=1, size=80, color="white"
-).transform_filter(nearest)
-realized_point = realized_chart.mark_point(
-    opacity=1, size=80, strokeWidth=3
-).transform_filter(nearest)
-target_circle = target_chart.mark_circle(
-    opacity=1, size=80, color="white"
-).transform_filter(nearest)
-target_point = target_chart.mark_point(
-    color=TARGET_COLOR, opacity=1, size=80, strokeWidth=3
-).transform_filter(nearest)
-
-vertical_line_selection = (
-    selectors
-    + vertical_line_rule
-    + realized_circle
-    + realized_point
-    + target_circle
-    + target_point
-)
+    final_chart = (
+        (top_chart & bottom_chart)
+        .interactive()
+        .properties(title="Volume (km) Burn-up Chart")
+    )
 
+    return final_chart
 
-# %% Final and rendering
-top_chart = (realized_chart + target_chart + vertical_line_selection).properties(
-    width=900, height=340
-)
-bottom_chart = (delta_chart + vertical_line_rule).properties(width=900, height=90)
 
-final_chart = (
-    (top_chart & bottom_chart)
-    .interactive()
-    .properties(title="Volume (km) Burn-up Chart")
+st_memoized_altair_chart(
+    key=("bdc_chart", get_cache_data_version(), target_label, repr(target), TODAY),
+    build_chart=build_chart,
 )
 
-st.altair_chart(final_chart, use_container_width=True)
+with st.sidebar:
+    st_sync_status()
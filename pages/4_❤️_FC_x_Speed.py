@@ -1,58 +1,119 @@
-import streamlit as st
+import datetime
+
 import altair as alt
+import numpy as np
+import pandas as pd
+import streamlit as st
 
-from utils.data import stop_if_no_activities
-from utils.data_cache import load_data_from_cache
+from utils.aggregations import get_heartrate_speed_density
+from utils.data import st_smoothing_selector, stop_if_no_activities
+from utils.data_cache import (
+    load_activities_streams_from_cache,
+    load_activity_streams_from_cache,
+    load_activities_from_cache,
+    load_smoothed_streams_from_cache,
+)
+from utils.sync_worker import st_sync_status
 
-activities_df, streams_df = load_data_from_cache()
+SINGLE_ACTIVITY = "Single activity"
+DATE_RANGE = "Date range"
+N_DETAIL_POINTS = 2000  # raw samples above the threshold, at most
+
+activities_df = load_activities_from_cache()
 stop_if_no_activities(activities_df)
 
 st.warning("🚧WIP")
 
 with st.sidebar:
-    selected_activity_idx = st.selectbox(
-        label="Select an activity",
-        options=activities_df.index[::-1],
-        format_func=lambda idx: f"{activities_df.loc[idx, 'start_date'].strftime('%y-%m-%d')}/ {activities_df.loc[idx, 'name']} ({activities_df.loc[idx, 'distance']/1000:.2f}km)",
+    selected_scope = st.radio(label="Activities", options=[SINGLE_ACTIVITY, DATE_RANGE])
+    if selected_scope == SINGLE_ACTIVITY:
+        selected_activity_idx = st.selectbox(
+            label="Select an activity",
+            options=activities_df.index[::-1],
+            format_func=lambda idx: f"{activities_df.loc[idx, 'start_date'].strftime('%y-%m-%d')}/ {activities_df.loc[idx, 'name']} ({activities_df.loc[idx, 'distance']/1000:.2f}km)",
+        )
+        smoothing_window, smoothing_method = st_smoothing_selector()
+    else:
+        last_date = activities_df.start_date.max().date()
+        selected_dates = st.date_input(
+            label="Date range",
+            value=(last_date - datetime.timedelta(days=28), last_date),
+            min_value=activities_df.start_date.min().date(),
+            max_value=last_date,
+        )
+    threshold = st.slider(
+        label="Heart rate threshold",
+        value=200,
+        min_value=50,
+        max_value=200,
+        help="Samples below are binned, samples above are drawn (a sample of them)",
+    )
+
+# %% Samples, with their speed in km/h
+if selected_scope == SINGLE_ACTIVITY:
+    selected_activity = activities_df.loc[selected_activity_idx]
+    streams_df = load_activity_streams_from_cache(selected_activity.id).assign(
+        speed_kmh=load_smoothed_streams_from_cache(
+            selected_activity.id,
+            "velocity_smooth",
+            window=smoothing_window,
+            method=smoothing_method,
+        )
+        * 3.6
     )
-    rolling_window = st.slider(
-        label="Smooth span", value=10, min_value=1, max_value=100
+else:
+    # Cleared, a range has no date; it has a single one while its end is being picked
+    if not selected_dates:
+        st.info("Select a date range.")
+        with st.sidebar:
+            st_sync_status()
+        st.stop()
+    start_date, end_date = (
+        selected_dates if len(selected_dates) == 2 else selected_dates * 2
     )
+    selected_activities_df = activities_df.loc[
+        activities_df.start_date.dt.date.between(start_date, end_date)
+    ]
+    streams_df = load_activities_streams_from_cache(
+        selected_activities_df.id.tolist()
+    ).assign(speed_kmh=lambda df: df.velocity_smooth * 3.6)
+    st.write(f"{len(selected_activities_df)} activities")
 
-selected_activity = activities_df.loc[selected_activity_idx]
-selected_activity_streams = streams_df.loc[
-    lambda df: df.activity_id == selected_activity.id
-].assign(
-    speed_ms=lambda df: df.velocity_smooth.rolling(
-        window=rolling_window, center=True, min_periods=1
-    ).mean(),
-    speed_kmh=lambda df: df.speed_ms * 3.6,
-)
+heartrates = streams_df.heartrate.to_numpy(dtype=np.float64, na_value=np.nan)
+speeds_kmh = streams_df.speed_kmh.to_numpy(dtype=np.float64, na_value=np.nan)
+is_above_threshold = heartrates >= threshold
 
-st.write(len(selected_activity_streams))
+# %% Density binned here, so that charts never hold every sample
+density_df = get_heartrate_speed_density(
+    heartrates[~is_above_threshold], speeds_kmh[~is_above_threshold]
+)
+detail_df = pd.DataFrame(
+    {
+        "heartrate": heartrates[is_above_threshold],
+        "speed_kmh": speeds_kmh[is_above_threshold],
+    }
+)
+detail_df = detail_df.sample(n=min(N_DETAIL_POINTS, len(detail_df)), random_state=0)
 
-slider = alt.binding_range(min=50, max=200, step=1)
-threshold = alt.param(name="threshold", value=200, bind=slider)
+st.write(f"{len(streams_df)} samples")
 
 detail_points = (
-    alt.Chart(selected_activity_streams)
+    alt.Chart(detail_df)
     .mark_circle()
     .encode(
         x=alt.X("heartrate:Q").title("Heart Rate (/min)"),
         y=alt.Y("speed_kmh:Q").title("Speed (km/h)"),
     )
-    .transform_filter(alt.datum["heartrate"] >= threshold)
 )
 
 aggregated_points = (
-    alt.Chart(selected_activity_streams)
+    alt.Chart(density_df)
     .mark_circle()
     .encode(
-        x=alt.X("heartrate:Q").bin(maxbins=20),
-        y=alt.Y("speed_kmh:Q").bin(maxbins=10),
-        size=alt.Size("count():Q"),
+        x=alt.X("heartrate:Q"),
+        y=alt.Y("speed_kmh:Q"),
+        size=alt.Size("count:Q"),
     )
-    .transform_filter(alt.datum["heartrate"] < threshold)
 )
 
 vertical_line = (
@@ -60,14 +121,13 @@ vertical_line = (
     .mark_rule(color="black")
     .encode(
         strokeWidth=alt.StrokeWidth(value=6),
-        x=alt.X(datum=alt.expr(threshold.name), type="quantitative"),
+        x=alt.X(datum=threshold, type="quantitative"),
     )
 )
 
-chart = (
-    (detail_points + aggregated_points + vertical_line)
-    .add_params(threshold)
-    .properties(height=400)
-)
+chart = (detail_points + aggregated_points + vertical_line).properties(height=400)
 
 st.altair_chart(chart, use_container_width=True)
+
+with st.sidebar:
+    st_sync_status()
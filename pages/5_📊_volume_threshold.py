@@ -4,18 +4,26 @@ import altair as alt
 import pandas as pd
 import streamlit as st
 
-from utils.data_cache import load_data_from_cache
+from utils.aggregations import get_speed_range_totals
+from utils.charts import st_memoized_altair_chart
+from utils.data_cache import (
+    get_cache_data_version,
+    load_activities_from_cache,
+    load_speed_histogram_from_cache,
+)
 from utils.data import (
     get_temporal_grouper,
     st_speed_range_selector,
     stop_if_no_activities,
 )
+from utils.sync_worker import st_sync_status
 
 
 DISTANCE_KM = "Distance (km)"
 TIME_S = "Time (s)"
-activities_df, streams_df = load_data_from_cache()
+activities_df = load_activities_from_cache()
 stop_if_no_activities(activities_df)
+speed_histogram = load_speed_histogram_from_cache()
 
 with st.sidebar:
     pd_grouper, alt_timeunit = get_temporal_grouper(key="zone-stats")
@@ -27,64 +35,75 @@ with st.sidebar:
     max_speed, min_speed = st_speed_range_selector()
 
 
-# %% Compute data
-cumulated_at_speed_range_df = (
-    streams_df.merge(
-        activities_df.rename(columns={"id": "activity_id"}).filter(
-            items=["activity_id", "start_date"]
-        ),
-        on="activity_id",
+# %% Chart, only built again when the data or the view changes
+def build_chart() -> alt.TopLevelMixin:
+    # %% Compute data
+    cumulated_at_speed_range_df = (
+        get_speed_range_totals(
+            activities_df,
+            speed_histogram,
+            pd_grouper,
+            min_speed=min_speed,
+            max_speed=max_speed,
+        )
+        .sort_values(by=selected_y_unit, ascending=False)
+        .head(25)
+        .assign(
+            order=lambda df: range(1, len(df) + 1),
+            tooltip_duration=lambda df: df.apply(
+                lambda row: f"{row['start_date']:%d %b %Y} | {timedelta(seconds=row['duration'])}",
+                axis=1,
+            ),
+            tooltip_distance_km=lambda df: df.apply(
+                lambda row: f"{row['start_date']:%d %b %Y} | {row['distance_km']:.2f} km",
+                axis=1,
+            ),
+            yearquarter=lambda df: (
+                df.start_date.dt.to_period("Q").astype(str).str.replace("Q", " Q")
+            ),
+        )
     )
-    .loc[
-        lambda df: (df.velocity_smooth >= min_speed) & (df.velocity_smooth <= max_speed)
-    ]
-    .assign(distance_km=lambda df: df.velocity_smooth / 1000, duration=1)
-    .filter(items=["start_date", "distance_km", "duration"])
-    .groupby([pd_grouper], as_index=False)
-    .sum()
-    .sort_values(by=selected_y_unit, ascending=False)
-    .head(25)
-    .assign(
-        order=lambda df: range(1, len(df) + 1),
-        tooltip_duration=lambda df: df.apply(
-            lambda row: f"{row['start_date']:%d %b %Y} | {timedelta(seconds=row['duration'])}",
-            axis=1,
-        ),
-        tooltip_distance_km=lambda df: df.apply(
-            lambda row: f"{row['start_date']:%d %b %Y} | {row['distance_km']:.2f} km",
-            axis=1,
-        ),
-        yearquarter=lambda df: (
-            df.start_date.dt.to_period("Q").astype(str).str.replace("Q", " Q")
-        ),
+
+    # %% Define graphs
+    legend_selection = alt.selection_point(fields=["yearquarter"], bind="legend")
+
+    chart_bar = (
+        alt.Chart(cumulated_at_speed_range_df)
+        .encode(
+            x=alt.X(
+                selected_y_unit,
+                type="quantitative",
+                title=selected_y_unit_label,
+            ),
+            y=alt.Y("order:O", title=""),
+            color=alt.Color("yearquarter:O", scale=alt.Scale(scheme="viridis")),
+            tooltip=f"tooltip_{selected_y_unit}",
+            opacity=alt.condition(legend_selection, alt.value(1), alt.value(0.2)),
+        )
+        .mark_bar(cornerRadius=2)
+        .add_params(legend_selection)
     )
-)
 
+    chart_text = chart_bar.encode(
+        color=alt.value("white"), text=f"tooltip_{selected_y_unit}"
+    ).mark_text(align="right", dx=-5, dy=2, fontWeight="bold")
 
-# %% Define graphs
-legend_selection = alt.selection_point(fields=["yearquarter"], bind="legend")
+    chart = (chart_bar + chart_text).properties(title="").configure_legend(title=None)
 
-chart_bar = (
-    alt.Chart(cumulated_at_speed_range_df)
-    .encode(
-        x=alt.X(
-            selected_y_unit,
-            type="quantitative",
-            title=selected_y_unit_label,
-        ),
-        y=alt.Y("order:O", title=""),
-        color=alt.Color("yearquarter:O", scale=alt.Scale(scheme="viridis")),
-        tooltip=f"tooltip_{selected_y_unit}",
-        opacity=alt.condition(legend_selection, alt.value(1), alt.value(0.2)),
-    )
-    .mark_bar(cornerRadius=2)
-    .add_params(legend_selection)
-)
+    return chart
 
-chart_text = chart_bar.encode(
-    color=alt.value("white"), text=f"tooltip_{selected_y_unit}"
-).mark_text(align="right", dx=-5, dy=2, fontWeight="bold")
 
-chart = (chart_bar + chart_text).properties(title="").configure_legend(title=None)
+st_memoized_altair_chart(
+    key=(
+        "volume_threshold",
+        get_cache_data_version(),
+        pd_grouper.freq,
+        selected_y_unit,
+        min_speed,
+        max_speed,
+    ),
+    build_chart=build_chart,
+)
 
-st.altair_chart(chart, use_container_width=True)
+with st.sidebar:
+    st_sync_status()
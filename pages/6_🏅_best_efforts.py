@@ -0,0 +1,119 @@
+import altair as alt
+import pandas as pd
+import streamlit as st
+
+from utils.best_efforts import BEST_EFFORT_DISTANCES_M
+from utils.charts import get_memoized, st_memoized_altair_chart
+from utils.data import stop_if_no_activities
+from utils.data_cache import (
+    get_cache_data_version,
+    load_activities_from_cache,
+    load_best_efforts_from_cache,
+)
+from utils.sync_worker import st_sync_status
+
+ALL_TIME = "All time"
+
+activities_df = load_activities_from_cache()
+stop_if_no_activities(activities_df)
+best_efforts_df = load_best_efforts_from_cache()
+if best_efforts_df.notna().sum().sum() == 0:
+    st.warning("No best effort found: activities streams are not downloaded yet.")
+    with st.sidebar:
+        st_sync_status()
+    st.stop()
+
+
+def get_records_df() -> pd.DataFrame:
+    """Fastest effort over each distance, all time and per season (year)"""
+    efforts_df = (
+        best_efforts_df.reset_index()
+        .melt(id_vars="activity_id", var_name="distance", value_name="time_s")
+        .dropna()
+        .merge(
+            activities_df.rename(columns={"id": "activity_id"}).filter(
+                items=["activity_id", "name", "start_date"]
+            ),
+            on="activity_id",
+        )
+        .assign(season=lambda df: df.start_date.dt.year.astype(str))
+        .reset_index(drop=True)
+    )
+    all_time_records_df = efforts_df.loc[
+        efforts_df.groupby("distance").time_s.idxmin()
+    ].assign(season=ALL_TIME)
+    season_records_df = efforts_df.loc[
+        efforts_df.groupby(["season", "distance"]).time_s.idxmin()
+    ]
+
+    return pd.concat([all_time_records_df, season_records_df]).assign(
+        distance_m=lambda df: df.distance.map(BEST_EFFORT_DISTANCES_M),
+        pace_s_km=lambda df: df.time_s / df.distance_m * 1000,
+        time=lambda df: (
+            pd.Timestamp(0) + pd.to_timedelta(df.time_s.round(), unit="s")
+        ).dt.strftime("%H:%M:%S"),
+        date=lambda df: df.start_date.dt.strftime("%d %b %Y"),
+    )
+
+
+records_df = get_memoized(
+    key=("best_efforts_df", get_cache_data_version()), compute=get_records_df
+)
+seasons = sorted(
+    records_df.season.loc[records_df.season != ALL_TIME].unique(), reverse=True
+)
+
+with st.sidebar:
+    selected_seasons = st.multiselect(
+        label="Seasons", options=seasons, default=seasons[:2]
+    )
+
+selected_records_df = records_df.loc[
+    records_df.season.isin([ALL_TIME, *selected_seasons])
+]
+
+
+# %% Mean-max pace curve, only built again when the data or the seasons change
+def build_chart() -> alt.TopLevelMixin:
+    return (
+        alt.Chart(selected_records_df)
+        .mark_line(point=True)
+        .encode(
+            x=alt.X("distance_m:Q")
+            .scale(type="log")
+            .axis(values=list(BEST_EFFORT_DISTANCES_M.values()), format="~s")
+            .title("Distance (m)"),
+            y=alt.Y("pace_s_km:Q")
+            .scale(zero=False, reverse=True)
+            .axis(
+                labelExpr="floor(datum.value / 60) + ':' + pad(floor(datum.value % 60), 2, '0', 'left')"
+            )
+            .title("Pace (min/km)"),
+            color=alt.Color("season:N", sort=[ALL_TIME, *seasons]).title(None),
+            tooltip=[
+                alt.Tooltip("distance:N", title="Distance"),
+                alt.Tooltip("time:N", title="Time"),
+                alt.Tooltip("date:N", title="Date"),
+                alt.Tooltip("name:N", title="Activity"),
+            ],
+        )
+        .properties(height=400)
+    )
+
+
+st_memoized_altair_chart(
+    key=("best_efforts", get_cache_data_version(), tuple(selected_seasons)),
+    build_chart=build_chart,
+)
+
+# %% Records, per distance and season
+st.dataframe(
+    selected_records_df.pivot(index="distance", columns="season", values="time")
+    .reindex(index=list(BEST_EFFORT_DISTANCES_M))
+    .dropna(how="all")
+    .filter(items=[ALL_TIME, *selected_seasons]),
+    use_container_width=True,
+)
+
+with st.sidebar:
+    st_sync_status()
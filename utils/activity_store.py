@@ -0,0 +1,159 @@
+import datetime
+import json
+import os
+from typing import Any
+
+import pandas as pd
+import yaml
+
+from constants import DATA_PATH, STRAVA_FULL_SYNC_INTERVAL_DAYS
+
+ACTIVITIES_FILEPATH = DATA_PATH / "activities.csv"
+SYNC_STATE_FILEPATH = DATA_PATH / "sync.yaml"
+SYNC_JOURNAL_FILEPATH = DATA_PATH / "sync_journal.jsonl"
+
+
+def _upsert(
+    activities_df: pd.DataFrame,
+    summaries: list[dict[str, Any]],
+    deleted_ids: list[int],
+) -> pd.DataFrame:
+    if not activities_df.empty:
+        replaced_ids = {summary["id"] for summary in summaries} | {*deleted_ids}
+        activities_df = activities_df.loc[~activities_df.id.isin(replaced_ids)]
+
+    summaries_df = pd.DataFrame(summaries)
+    if not summaries_df.empty:
+        summaries_df["start_date"] = pd.to_datetime(summaries_df.start_date, utc=True)
+
+    return pd.concat(
+        [df for df in [activities_df, summaries_df] if not df.empty]
+        or [pd.DataFrame()],
+        ignore_index=True,
+    )
+
+
+def read_activities() -> pd.DataFrame:
+    """Activities of activities.csv, with those committed by an ongoing sync"""
+    activities_df = (
+        pd.read_csv(ACTIVITIES_FILEPATH, index_col=0, parse_dates=["start_date"])
+        if ACTIVITIES_FILEPATH.exists()
+        else pd.DataFrame()
+    )
+
+    plan, committed_ids = read_sync_journal()
+    if plan is None:
+        return activities_df
+
+    return _upsert(
+        activities_df,
+        get_committed_summaries(plan, committed_ids),
+        deleted_ids=plan["deleted_ids"],
+    )
+
+
+def write_activities(activities_df: pd.DataFrame) -> None:
+    """Writes activities sorted by start date, replacing the file atomically"""
+    DATA_PATH.mkdir(exist_ok=True)
+    tmp_filepath = ACTIVITIES_FILEPATH.with_suffix(".csv.tmp")
+    activities_df.sort_values(by="start_date").reset_index(drop=True).to_csv(
+        tmp_filepath
+    )
+    os.replace(tmp_filepath, ACTIVITIES_FILEPATH)
+
+
+# ------ Sync journal: a plan, then one commit record per downloaded activity
+def start_sync_journal(plan: dict[str, Any]) -> None:
+    """Writes the plan of a sync: its summaries, deleted and to be downloaded IDs"""
+    DATA_PATH.mkdir(exist_ok=True)
+    tmp_filepath = SYNC_JOURNAL_FILEPATH.with_suffix(".jsonl.tmp")
+    with open(tmp_filepath, "w") as f:
+        f.write(json.dumps({"plan": plan}, default=str) + "\n")
+    os.replace(tmp_filepath, SYNC_JOURNAL_FILEPATH)
+
+
+def commit_to_sync_journal(activity_id: int) -> None:
+    record = json.dumps({"commit": activity_id}) + "\n"
+    with open(SYNC_JOURNAL_FILEPATH, "ab+") as f:
+        # A record cut by an interruption is ended first, not to run into this one
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            record = "\n" + record
+        f.write(record.encode())
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_sync_journal() -> tuple[dict[str, Any] | None, set[int]]:
+    """Returns the plan of the ongoing sync, if any, and its committed IDs"""
+    if not SYNC_JOURNAL_FILEPATH.exists():
+        return None, set()
+
+    with open(SYNC_JOURNAL_FILEPATH) as f:
+        plan, *commits = f.read().splitlines()
+
+    committed_ids = set()
+    for commit in commits:
+        try:
+            committed_ids.add(json.loads(commit)["commit"])
+        except json.JSONDecodeError:  # cut by an interruption, the sync resumed
+            continue
+
+    return json.loads(plan)["plan"], committed_ids
+
+
+def get_committed_summaries(
+    plan: dict[str, Any], committed_ids: set[int]
+) -> list[dict[str, Any]]:
+    """Summaries of the plan whose streams were downloaded, or needed none"""
+    download_ids = set(plan["download_ids"])
+
+    return [
+        summary
+        for summary in plan["summaries"]
+        if summary["id"] not in download_ids or summary["id"] in committed_ids
+    ]
+
+
+def close_sync_journal() -> None:
+    """Moves the plan summaries to activities.csv and the watermark, once complete"""
+    plan, _ = read_sync_journal()
+    if plan is None:
+        return
+
+    # Read with the journal, all of its summaries committed
+    activities_df = read_activities()
+    if not activities_df.empty:
+        write_activities(activities_df)
+    else:
+        ACTIVITIES_FILEPATH.unlink(missing_ok=True)
+    save_sync_state(**plan["sync_state"])
+    SYNC_JOURNAL_FILEPATH.unlink()
+
+
+# ------ Sync watermark
+def load_sync_state() -> dict[str, Any]:
+    if not SYNC_STATE_FILEPATH.exists():
+        return {}
+
+    with open(SYNC_STATE_FILEPATH) as f:
+        return yaml.safe_load(f) or {}
+
+
+def save_sync_state(**state: Any) -> None:
+    DATA_PATH.mkdir(exist_ok=True)
+    state = {**load_sync_state(), **state}
+    with open(SYNC_STATE_FILEPATH, "w") as f:
+        yaml.safe_dump(state, f)
+
+
+def is_full_sync_due(sync_state: dict[str, Any]) -> bool:
+    """Full syncs catch edits, deletions and late uploads incremental syncs miss"""
+    if "last_start_date" not in sync_state or "last_full_sync_at" not in sync_state:
+        return True
+
+    last_full_sync_at = datetime.datetime.fromisoformat(sync_state["last_full_sync_at"])
+
+    return datetime.datetime.now(datetime.timezone.utc) - last_full_sync_at > (
+        datetime.timedelta(days=STRAVA_FULL_SYNC_INTERVAL_DAYS)
+    )
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+from utils.speed_histogram import SpeedHistogram
+
+HEARTRATE_BIN_BPM = 5
+SPEED_BIN_KMH = 0.5
+
+
+def with_start_date(
+    streams_df: pd.DataFrame, activities_df: pd.DataFrame
+) -> pd.DataFrame:
+    return streams_df.merge(
+        activities_df.rename(columns={"id": "activity_id"}).filter(
+            items=["activity_id", "start_date"]
+        ),
+        on="activity_id",
+    )
+
+
+def get_activity_zone_totals(streams_df: pd.DataFrame) -> pd.DataFrame:
+    """Time (s) and distance (km) spent in each speed zone, per activity"""
+    velocity_by_zone = streams_df.groupby(
+        ["activity_id", "speed_zone"], observed=True
+    ).velocity_smooth
+
+    activity_zone_totals = pd.DataFrame(
+        {
+            "duration": velocity_by_zone.size(),
+            "distance_km": velocity_by_zone.sum() / 1000,
+        }
+    ).reset_index()
+
+    # Categorical in streams, plain IDs here to merge with activities
+    return activity_zone_totals.astype({"activity_id": "int64"})
+
+
+def get_zone_totals(
+    activities_df: pd.DataFrame,
+    activity_zone_totals_df: pd.DataFrame,
+    pd_grouper: pd.Grouper,
+) -> pd.DataFrame:
+    """Time (s) and distance (km) spent in each speed zone, per period"""
+    return (
+        with_start_date(activity_zone_totals_df, activities_df)
+        .filter(items=["start_date", "speed_zone", "distance_km", "duration"])
+        .groupby([pd_grouper, "speed_zone"], as_index=False, observed=True)
+        .sum()
+    )
+
+
+def get_speed_range_totals(
+    activities_df: pd.DataFrame,
+    speed_histogram: SpeedHistogram,
+    pd_grouper: pd.Grouper,
+    min_speed: float,
+    max_speed: float,
+) -> pd.DataFrame:
+    """Time (s) and distance (km) run within a speed range (m.s-1), per period"""
+    return (
+        with_start_date(
+            speed_histogram.get_totals(min_speed=min_speed, max_speed=max_speed),
+            activities_df,
+        )
+        .filter(items=["start_date", "distance_km", "duration"])
+        .groupby([pd_grouper], as_index=False)
+        .sum()
+    )
+
+
+def get_heartrate_speed_density(
+    heartrates: np.ndarray, speeds_kmh: np.ndarray
+) -> pd.DataFrame:
+    """Samples count per (heart rate, speed) bin, at the bin centers, non-empty only"""
+    is_valid = ~(np.isnan(heartrates) | np.isnan(speeds_kmh))
+    heartrate_bins = np.floor(heartrates[is_valid] / HEARTRATE_BIN_BPM).astype(np.int64)
+    speed_bins = np.floor(speeds_kmh[is_valid] / SPEED_BIN_KMH).astype(np.int64)
+    if not len(heartrate_bins):
+        return pd.DataFrame(columns=["heartrate", "speed_kmh", "count"])
+
+    n_speed_bins = speed_bins.max() + 1
+    counts = np.bincount(heartrate_bins * n_speed_bins + speed_bins)
+    flat_bins = np.flatnonzero(counts)
+    heartrate_bins, speed_bins = np.divmod(flat_bins, n_speed_bins)
+
+    return pd.DataFrame(
+        {
+            "heartrate": (heartrate_bins + 0.5) * HEARTRATE_BIN_BPM,
+            "speed_kmh": (speed_bins + 0.5) * SPEED_BIN_KMH,
+            "count": counts[flat_bins],
+        }
+    )
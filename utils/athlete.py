@@ -0,0 +1,38 @@
+from typing import Any
+
+import yaml
+
+from constants import DATA_PATH, VMA_KMH
+from utils.zones import SPEED_ZONE_VMA_RATIOS, get_speed_zone_boundaries
+
+ATHLETE_SETTINGS_FILEPATH = DATA_PATH / "athlete.yaml"
+
+
+def load_athlete_settings() -> dict[str, Any]:
+    if not ATHLETE_SETTINGS_FILEPATH.exists():
+        return {}
+
+    with open(ATHLETE_SETTINGS_FILEPATH) as f:
+        return yaml.safe_load(f) or {}
+
+
+def save_athlete_settings(**settings: Any) -> None:
+    DATA_PATH.mkdir(exist_ok=True)
+    # Merged before opening the file, which truncates it
+    settings = {**load_athlete_settings(), **settings}
+    with open(ATHLETE_SETTINGS_FILEPATH, "w") as f:
+        yaml.safe_dump(settings, f)
+
+
+def get_vma_kmh() -> float:
+    return load_athlete_settings().get("vma_kmh", VMA_KMH)
+
+
+def get_athlete_speed_zone_boundaries() -> tuple[float, ...]:
+    """Zone boundaries (m.s-1) from the athlete VMA and optional custom ratios"""
+    settings = load_athlete_settings()
+
+    return get_speed_zone_boundaries(
+        vma=settings.get("vma_kmh", VMA_KMH) * 1000 / 3600,
+        vma_ratios=tuple(settings.get("speed_zone_vma_ratios", SPEED_ZONE_VMA_RATIOS)),
+    )
@@ -0,0 +1,52 @@
+import numpy as np
+
+# Distances (m) of the best efforts kept per activity, by label
+BEST_EFFORT_DISTANCES_M = {
+    "400 m": 400,
+    "800 m": 800,
+    "1 km": 1000,
+    "1 mile": 1609.344,
+    "5 km": 5000,
+    "10 km": 10000,
+    "Half marathon": 21097.5,
+    "Marathon": 42195,
+}
+
+
+def get_best_times(distances: np.ndarray, times: np.ndarray) -> list[float | None]:
+    """Fastest time (s) over each best effort distance, None when the activity is shorter.
+
+    Every sample is the end of an effort, started where the distance run was that
+    much shorter: found by binary search over the cumulative distance stream, and
+    interpolated between the samples around it. A pause, at the same distance,
+    counts from its last sample.
+    """
+    is_valid = ~(np.isnan(distances) | np.isnan(times))
+    # Non decreasing, should a GPS glitch have it go back
+    distances = np.maximum.accumulate(distances[is_valid].astype(np.float64))
+    times = times[is_valid].astype(np.float64)
+
+    best_times: list[float | None] = []
+    for effort_m in BEST_EFFORT_DISTANCES_M.values():
+        if not len(distances) or distances[-1] - distances[0] < effort_m:
+            best_times.append(None)
+            continue
+
+        end_positions = np.arange(
+            np.searchsorted(distances, distances[0] + effort_m, side="left"),
+            len(distances),
+        )
+        start_distances = distances[end_positions] - effort_m
+        starts = np.searchsorted(distances, start_distances, side="right") - 1
+        nexts = np.minimum(starts + 1, len(distances) - 1)
+        spans = distances[nexts] - distances[starts]
+        ratios = np.divide(
+            start_distances - distances[starts],
+            spans,
+            out=np.zeros_like(spans),
+            where=spans > 0,
+        )
+        start_times = times[starts] + ratios * (times[nexts] - times[starts])
+        best_times.append(round(float(np.min(times[end_positions] - start_times)), 1))
+
+    return best_times
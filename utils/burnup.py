@@ -0,0 +1,106 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.targets import Target
+
+POSITIVE_COLOR = "darkseagreen"
+NEGATIVE_COLOR = "indianred"
+
+
+def _get_excluded_days(
+    targets: list[Target],
+    start_dates: pd.DatetimeIndex,
+    offsets: np.ndarray,
+    n_days: np.ndarray,
+) -> np.ndarray:
+    """Whether each day is in an excluded period of its target"""
+    exclusions = [
+        (target_idx, exclusion["start_date"], exclusion["end_date"])
+        for target_idx, target in enumerate(targets)
+        for exclusion in target.get("exclude") or []
+    ]
+    if not exclusions:
+        return np.zeros(offsets[-1], dtype=bool)
+
+    target_idx, exclusion_starts, exclusion_ends = map(np.array, zip(*exclusions))
+    # Day positions within the target period, clipped to it
+    starts = np.clip(
+        (pd.to_datetime(exclusion_starts) - start_dates[target_idx]).days.to_numpy(),
+        0,
+        n_days[target_idx],
+    )
+    stops = np.clip(
+        (pd.to_datetime(exclusion_ends) - start_dates[target_idx]).days.to_numpy() + 1,
+        0,
+        n_days[target_idx],
+    )
+
+    # +1 where an exclusion starts and -1 where it stops: days covered have a
+    # positive cumulative sum, and no exclusion spills over the next target
+    n_exclusions_changes = np.zeros(offsets[-1] + 1, dtype=np.int64)
+    np.add.at(n_exclusions_changes, offsets[target_idx] + starts, 1)
+    np.add.at(n_exclusions_changes, offsets[target_idx] + np.maximum(starts, stops), -1)
+
+    return np.cumsum(n_exclusions_changes)[:-1] > 0
+
+
+def get_burn_up_df(
+    daily_totals_df: pd.DataFrame, targets: dict[str, Target]
+) -> pd.DataFrame:
+    """Daily cumulated distance vs. target, excluded periods not counting.
+
+    Every target is evaluated at once, in rows of (target, date) over its period.
+    """
+    labels = list(targets)
+    target_list = [targets[label] for label in labels]
+    start_dates = pd.to_datetime([target["start_date"] for target in target_list])
+    end_dates = pd.to_datetime([target["end_date"] for target in target_list])
+    target_kms = np.array([target["target_km"] for target in target_list], dtype=float)
+
+    # %% One row per target and day of its period
+    n_days = np.maximum((end_dates - start_dates).days.to_numpy() + 1, 0)
+    offsets = np.concatenate([[0], np.cumsum(n_days)])
+    target_idx = np.repeat(np.arange(len(labels)), n_days)
+    dates = start_dates.to_numpy()[target_idx] + (
+        np.arange(offsets[-1]) - offsets[:-1][target_idx]
+    ).astype("timedelta64[D]")
+
+    is_day_active = ~_get_excluded_days(target_list, start_dates, offsets, n_days)
+    n_active_days = np.bincount(
+        target_idx, weights=is_day_active, minlength=len(labels)
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        target_km_day = is_day_active * (target_kms / n_active_days)[target_idx]
+
+    # %% Distances run, not counted yet after today
+    daily_distances = daily_totals_df.set_index(
+        daily_totals_df.start_date.dt.tz_localize(None)
+    ).distance
+    distance = np.where(
+        dates > np.datetime64(datetime.datetime.now().date()),
+        np.nan,
+        daily_distances.reindex(dates, fill_value=0).to_numpy(dtype=float),
+    )
+
+    burn_up_df = pd.DataFrame(
+        {
+            "target": np.array(labels, dtype=object)[target_idx],
+            "date": dates,
+            "target_km_day": target_km_day,
+            "distance": distance,
+        }
+    )
+    by_target = burn_up_df.groupby(target_idx)
+    cum_distance = by_target.distance.cumsum().to_numpy() / 1000
+    cum_target = by_target.target_km_day.cumsum().to_numpy()
+    delta = cum_distance - cum_target
+
+    return burn_up_df.assign(
+        cum_distance=cum_distance,
+        cum_target=cum_target,
+        delta=delta,
+        delta_color=np.where(delta >= 0, POSITIVE_COLOR, NEGATIVE_COLOR),
+        percent_target=cum_distance / target_kms[target_idx],
+    )
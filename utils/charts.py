@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Any, Callable, Hashable, TypeVar
+
+import altair as alt
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+T = TypeVar("T")
+
+MEMOIZED_CHARTS_CACHE_SIZE = 32  # specs and derived frames, across pages
+
+
+class _LRUCache:
+    """Values by key, the least recently used ones evicted first"""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.values: OrderedDict[Hashable, Any] = OrderedDict()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], T]) -> T:
+        with self.lock:
+            if key in self.values:
+                self.values.move_to_end(key)
+                return self.values[key]
+
+        # Computed outside the lock: concurrent misses may compute it twice
+        value = compute()
+        with self.lock:
+            self.values[key] = value
+            while len(self.values) > self.maxsize:
+                self.values.popitem(last=False)
+
+        return value
+
+
+@st.cache_resource
+def _get_memoized_charts() -> _LRUCache:
+    return _LRUCache(maxsize=MEMOIZED_CHARTS_CACHE_SIZE)
+
+
+def get_memoized(key: Hashable, compute: Callable[[], T]) -> T:
+    """Returns the value computed for a key: (page, data version, widget values).
+
+    Shared between sessions, do not mutate it.
+    """
+    return _get_memoized_charts().get_or_compute(key, compute)
+
+
+def _to_vega_lite_spec(chart: alt.TopLevelMixin) -> dict[str, Any]:
+    """As st.altair_chart does, but with datasets converted to Arrow once for all"""
+    datasets: dict[str, pa.Table] = {}
+
+    def to_named_dataset(data: pd.DataFrame) -> dict[str, str]:
+        name = str(id(data))
+        datasets[name] = pa.Table.from_pandas(data)
+        return {"name": name}
+
+    alt.data_transformers.register("arrow", to_named_dataset)
+    # Streamlit renders charts without the width and height of the default theme
+    with alt.themes.enable("none") if alt.themes.active == "default" else nullcontext():
+        with alt.data_transformers.enable("arrow"):
+            return {**chart.to_dict(), "datasets": datasets}
+
+
+def st_memoized_altair_chart(
+    key: Hashable, build_chart: Callable[[], alt.TopLevelMixin]
+) -> None:
+    """Renders the chart built for a key: (page, data version, widget values).
+
+    Unchanged views skip the aggregations, the Altair validation and the data
+    serialization, their spec is reused as is.
+    """
+    spec = get_memoized(key, lambda: _to_vega_lite_spec(build_chart()))
+    st.vega_lite_chart(spec, use_container_width=True)
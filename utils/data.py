@@ -4,12 +4,21 @@ from typing import Any
 import pandas as pd
 import streamlit as st
 
+from utils.smoothing import SmoothingMethod
+from utils.sync_worker import st_sync_status
+
 DAY = "Day"
 WEEK = "Week"
 MONTH = "Month"
 QUARTER = "Quarter"
 YEAR = "Year"
 
+SMOOTHING_METHODS: dict[str, SmoothingMethod] = {
+    "Rolling mean (samples)": "rolling",
+    "Rolling mean (seconds)": "time",
+    "Exponential": "exponential",
+}
+
 MAX_SPEED_RANGE = datetime.time(minute=2, second=30)
 MIN_SPEED_RANGE = datetime.time(minute=8, second=0)
 
@@ -17,6 +26,8 @@ MIN_SPEED_RANGE = datetime.time(minute=8, second=0)
 def stop_if_no_activities(activities_df: pd.DataFrame) -> None:
     if activities_df.empty:
         st.warning("No activity found. Download new activities from the 🏠 home page.")
+        with st.sidebar:
+            st_sync_status()
         st.stop()
 
 
@@ -69,3 +80,21 @@ def st_speed_range_selector(key: str | None = None) -> tuple[float, float]:
     )
 
     return max_speed_range_ms, min_speed_range_ms
+
+
+def st_smoothing_selector(key: str | None = None) -> tuple[int, SmoothingMethod]:
+    """Returns the smoothing window, in samples or seconds, and method"""
+    smoothing_label = st.selectbox(
+        label="Smoothing",
+        options=SMOOTHING_METHODS,
+        key=f"selectbox-{key}" if key else None,
+    )
+    window = st.slider(
+        label="Smooth span",
+        value=10,
+        min_value=1,
+        max_value=100,
+        key=f"slider-{key}" if key else None,
+    )
+
+    return window, SMOOTHING_METHODS[smoothing_label]
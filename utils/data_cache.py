@@ -1,148 +1,648 @@
-import time
+import functools
+import threading
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
-import stravalib.model
-from stqdm import stqdm
+from pandas.api.types import union_categoricals
 import streamlit as st
 
-from constants import (
-    DATA_PATH,
-    DOWNLOAD_LIMIT,
-    STRAVA_FIRST_ACTIVITY_START_DATE,
-    STRAVA_RUN_SPORT_TYPES,
-    STRAVA_STREAM_TYPES,
+from constants import DATA_PATH, QUERY_BACKEND
+from utils.activity_store import (
+    ACTIVITIES_FILEPATH,
+    SYNC_JOURNAL_FILEPATH,
+    read_activities,
 )
-from utils.strava import get_strava_client
-from utils.zones import get_speed_zone_label
+from utils.aggregations import get_activity_zone_totals
+from utils.athlete import get_athlete_speed_zone_boundaries
+from utils.best_efforts import BEST_EFFORT_DISTANCES_M
+from utils.charts import get_memoized
+from utils.query_engine import query_activity_zone_totals, query_speed_histogram
+from utils.rollups import get_daily_totals, get_daily_zone_totals
+from utils.smoothing import SmoothingMethod, smooth
+from utils.speed_histogram import SpeedHistogram
+from utils.stream_store import (
+    FileStat,
+    get_streams_file,
+    get_streams_manifest,
+    migrate_csv_cache,
+    read_best_efforts,
+    read_streams,
+    read_streams_snapshot,
+    write_streams_snapshot,
+)
+from utils.zones import get_speed_zones
 
+SMOOTHED_STREAMS_CACHE_SIZE = 64  # (activity, column, window, method) entries
+SNAPSHOT_DEBOUNCE_S = 30.0  # streams snapshotted once unchanged for that long
 
-ACTIVITIES_FILEPATH = DATA_PATH / "activities.csv"
+EMPTY_ACTIVITY_ZONE_TOTALS = pd.DataFrame(
+    columns=["activity_id", "speed_zone", "duration", "distance_km"]
+)
+EMPTY_BEST_EFFORTS = pd.DataFrame(
+    columns=list(BEST_EFFORT_DISTANCES_M), dtype=float
+).rename_axis("activity_id")
 
 
-@st.cache_data
-def load_data_from_cache() -> tuple[pd.DataFrame, pd.DataFrame]:
-    if not ACTIVITIES_FILEPATH.exists():
-        return pd.DataFrame(), pd.DataFrame()
+def _get_file_stat(path: Path) -> FileStat | None:
+    if not path.exists():
+        return None
 
-    activities = pd.read_csv(
-        ACTIVITIES_FILEPATH, index_col=0, parse_dates=["start_date"]
-    ).sort_values(by="start_date")
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime_ns
 
-    if activities.empty:
-        return activities, pd.DataFrame()
 
-    streams = pd.concat(
-        [
-            pd.read_csv(DATA_PATH / f"{activity_id}.csv", index_col=0).assign(
-                activity_id=activity_id
-            )
-            for activity_id in activities.id.unique()
-        ]
-    ).assign(speed_zone=lambda df: df.velocity_smooth.map(get_speed_zone_label))
+def _get_streams_offsets(streams: pd.DataFrame) -> dict[int, tuple[int, int]]:
+    """Maps activity IDs to the (start, stop) rows of their contiguous streams"""
+    if streams.empty:
+        return {}
 
-    return activities, streams
+    activity_codes = streams.activity_id.cat.codes.to_numpy()
+    starts = np.flatnonzero(activity_codes[1:] != activity_codes[:-1]) + 1
+    starts = np.concatenate([[0], starts])
+    stops = np.concatenate([starts[1:], [len(activity_codes)]])
+    activity_ids = streams.activity_id.cat.categories[activity_codes[starts]]
 
+    return {
+        int(activity_id): (int(start), int(stop))
+        for activity_id, start, stop in zip(activity_ids, starts, stops)
+    }
 
-def _get_streams_file(activity: stravalib.model.Activity) -> Path:
-    return DATA_PATH / f"{activity.id}.csv"
 
+def _concat_streams(streams: pd.DataFrame, new_streams: pd.DataFrame) -> pd.DataFrame:
+    """Concatenates streams, keeping activity_id categorical.
 
-def _parse_latlng(df: pd.DataFrame, activity_id: int) -> pd.DataFrame:
-    if "latlng" not in df.columns:
-        return df
+    A plain concat falls back to int64, as both sides have different categories.
+    """
+    if streams.empty:
+        return new_streams
 
-    try:
-        df_with_latlng = df.join(
-            df.latlng.apply(pd.Series).rename(columns={0: "latitude", 1: "longitude"})
-        )
-    except Exception as e:
-        st.warning(f"Fail to parse lat/lng for activity ID={activity_id}")
-        print(f"Fail to parse lat/lng for activity ID={activity_id}")
-        print(e)
-        df_with_latlng = df
+    return pd.concat(
+        [streams.drop(columns="activity_id"), new_streams.drop(columns="activity_id")],
+        ignore_index=True,
+    ).assign(
+        activity_id=union_categoricals([streams.activity_id, new_streams.activity_id])
+    )[
+        streams.columns
+    ]
+
+
+class _MaterializedData:
+    """Activities and streams frames, kept in sync with the cache files.
+
+    Streams are tracked with a manifest of file sizes and mtimes: a refresh only
+    reads the activities whose file is new or changed, and drops the others.
+    Speed zones are only re-computed when the athlete zone boundaries change.
+
+    Per activity zone totals and speed histograms are maintained along with the
+    streams, so that zone and speed range aggregations never need to go through
+    every stream sample.
+
+    Streams of an activity are kept contiguous, and their row offsets indexed, so
+    that they can be sliced out without scanning the whole history.
+
+    Streams are snapshotted to an Arrow file and memory-mapped from it: a restart
+    picks up from the snapshot, and only reads the streams changed since. As it
+    rewrites every stream, the snapshot is written off the request path, once
+    streams stopped changing for `snapshot_debounce_s`, or on `write_snapshot`.
+    """
+
+    def __init__(self, snapshot_debounce_s: float | None = SNAPSHOT_DEBOUNCE_S) -> None:
+        self.lock = threading.Lock()
+        self.snapshot_lock = threading.Lock()
+        self.snapshot_debounce_s = snapshot_debounce_s
+        self.snapshot_timer: threading.Timer | None = None
+        self.is_snapshot_stale = False
+        self.activities = pd.DataFrame()
+        self.streams = pd.DataFrame()
+        self.activity_zone_totals = EMPTY_ACTIVITY_ZONE_TOTALS
+        self.speed_histogram = SpeedHistogram.empty()
+        self.streams_offsets: dict[int, tuple[int, int]] = {}
+        self.activities_stat: tuple[FileStat | None, FileStat | None] = (None, None)
+        self.streams_manifest: dict[int, FileStat] = {}
+        self.speed_zone_boundaries: tuple[float, ...] = ()
+        self.version = 0  # incremented on every change, a key for derived data
+
+    def refresh(self) -> tuple[pd.DataFrame, pd.DataFrame]:
+        with self.lock:
+            if DATA_PATH.exists():
+                migrate_csv_cache()
+
+            self._refresh_activities()
+            self._refresh_speed_zones(get_athlete_speed_zone_boundaries())
+            self._refresh_streams()
 
-    return df_with_latlng.drop(columns=["latlng"])
+            return self.activities, self.streams
 
+    def refresh_activities(self) -> pd.DataFrame:
+        """Refreshes activities only, for the pages that never need streams"""
+        with self.lock:
+            self._refresh_activities()
 
-def update_cache() -> None:
-    DATA_PATH.mkdir(exist_ok=True)
-    strava_client = get_strava_client()
+            return self.activities
 
-    # 1. Get all activities
-    st.info("Download activities from Strava ...")
-    activities = [
-        activity
-        for activity in strava_client.get_activities(
-            after=STRAVA_FIRST_ACTIVITY_START_DATE, limit=None
+    def get_activity_streams(self, activity_id: int) -> pd.DataFrame:
+        # Offsets only hold for the streams they were computed with
+        with self.lock:
+            start, stop = self.streams_offsets.get(activity_id, (0, 0))
+
+            return self.streams.iloc[start:stop]
+
+    def get_activities_streams(self, activity_ids: list[int]) -> pd.DataFrame:
+        with self.lock:
+            offsets = [
+                self.streams_offsets[activity_id]
+                for activity_id in activity_ids
+                if activity_id in self.streams_offsets
+            ]
+            positions = np.concatenate(
+                [np.arange(start, stop) for start, stop in offsets] or [[]]
+            ).astype(np.int64)
+
+            return self.streams.iloc[positions]
+
+    def get_memory_usage(self) -> pd.DataFrame:
+        """Bytes per column (index included) of every frame held in memory"""
+        frames = {
+            "activities": self.activities,
+            "streams": self.streams,
+            "activity_zone_totals": self.activity_zone_totals,
+        }
+        rows = [
+            {"frame": frame, "column": column, "bytes": n_bytes}
+            for frame, df in frames.items()
+            for column, n_bytes in df.memory_usage(deep=True).items()
+        ] + [
+            {
+                "frame": "speed_histogram",
+                "column": attribute,
+                "bytes": getattr(self.speed_histogram, attribute).nbytes,
+            }
+            for attribute in ["activity_ids", "cum_durations", "cum_distances_km"]
+        ]
+
+        return pd.DataFrame(rows, columns=["frame", "column", "bytes"])
+
+    def _refresh_activities(self) -> None:
+        # Activities committed by an ongoing sync are in its journal
+        activities_stat = (
+            _get_file_stat(ACTIVITIES_FILEPATH),
+            _get_file_stat(SYNC_JOURNAL_FILEPATH),
         )
-        if activity.sport_type in STRAVA_RUN_SPORT_TYPES
-    ]
+        if activities_stat == self.activities_stat:
+            return
+
+        self.activities_stat = activities_stat
+        self.version += 1
+        activities = read_activities()
+        self.activities = (
+            activities if activities.empty else activities.sort_values(by="start_date")
+        )
+
+    def _refresh_speed_zones(self, boundaries: tuple[float, ...]) -> None:
+        if boundaries == self.speed_zone_boundaries:
+            return
+
+        self.speed_zone_boundaries = boundaries
+        self.version += 1
+        if not self.streams.empty:
+            self.streams = self.streams.assign(
+                speed_zone=get_speed_zones(self.streams.velocity_smooth, boundaries)
+            )
+            self.activity_zone_totals = get_activity_zone_totals(self.streams)
+        else:
+            self.activity_zone_totals = EMPTY_ACTIVITY_ZONE_TOTALS
 
-    st.success(f"Found (total) {len(activities)} activities.")
+    def _refresh_streams(self) -> None:
+        if self.activities.empty:
+            self.streams, self.streams_manifest = pd.DataFrame(), {}
+            self.activity_zone_totals = EMPTY_ACTIVITY_ZONE_TOTALS
+            self.speed_histogram = SpeedHistogram.empty()
+            self.streams_offsets = {}
+            return
 
-    # 2. Download missing activity streams
-    activities_to_be_downloaded, activities_already_in_cache = [], []
-    for activity in activities:
-        (activities_to_be_downloaded, activities_already_in_cache)[
-            _get_streams_file(activity).exists()
-        ].append(activity)
+        if not self.streams_manifest:
+            self._load_streams_snapshot()
 
-    st.info(f"{len(activities_already_in_cache)} already in cache.")
+        manifest = _get_activities_streams_manifest(self.activities)
+        removed_ids, added_ids = _diff_manifests(self.streams_manifest, manifest)
+        if not removed_ids and not added_ids:
+            return
 
-    if len(activities_to_be_downloaded) > DOWNLOAD_LIMIT:
-        st.warning(
-            f"Too much activities to be downloaded: it will download {DOWNLOAD_LIMIT} first, hit the download button later for the rest"
+        streams, activity_zone_totals, speed_histogram = (
+            self.streams,
+            self.activity_zone_totals,
+            self.speed_histogram,
         )
-        activities_to_be_downloaded = activities_to_be_downloaded[-DOWNLOAD_LIMIT:]
+        if removed_ids:
+            streams = streams.loc[~streams.activity_id.isin(removed_ids)]
+            activity_zone_totals = activity_zone_totals.loc[
+                ~activity_zone_totals.activity_id.isin(removed_ids)
+            ]
+            speed_histogram = speed_histogram.drop(removed_ids)
 
-    st.info(f"Downloading data for {len(activities_to_be_downloaded)} activities ...")
+        if added_ids:
+            new_streams = read_streams(added_ids).assign(
+                speed_zone=lambda df: get_speed_zones(
+                    df.velocity_smooth, self.speed_zone_boundaries
+                )
+            )
+            streams = _concat_streams(streams, new_streams)
+            new_activity_zone_totals = get_activity_zone_totals(new_streams)
+            activity_zone_totals = (
+                new_activity_zone_totals
+                if activity_zone_totals.empty
+                else pd.concat(
+                    [activity_zone_totals, new_activity_zone_totals],
+                    ignore_index=True,
+                )
+            )
+            speed_histogram = speed_histogram.append(
+                SpeedHistogram.from_streams(new_streams)
+            )
+
+        self.streams = streams
+        self.activity_zone_totals = activity_zone_totals
+        self.speed_histogram = speed_histogram
+        self.streams_offsets = _get_streams_offsets(self.streams)
+        self.streams_manifest = manifest
+        self.version += 1
+        self._schedule_snapshot()
 
-    # 2.1 Write stream csv files
-    for activity in stqdm(activities_to_be_downloaded, desc="Collecting streams"):
-        activity_streams = strava_client.get_activity_streams(
-            activity_id=activity.id,
-            types=STRAVA_STREAM_TYPES,
+    def _schedule_snapshot(self) -> None:
+        """Debounced: the snapshot is written once refreshes stop changing streams"""
+        self.is_snapshot_stale = True
+        if self.snapshot_debounce_s is None:
+            return
+
+        if self.snapshot_timer is not None:
+            self.snapshot_timer.cancel()
+        self.snapshot_timer = threading.Timer(
+            self.snapshot_debounce_s, self.write_snapshot
         )
+        self.snapshot_timer.daemon = True
+        self.snapshot_timer.start()
 
-        (
-            pd.DataFrame(
-                {
-                    key: activity_streams[key].data
-                    for key in ["distance", *STRAVA_STREAM_TYPES]
-                    if key in activity_streams.keys()
+    def write_snapshot(self) -> None:
+        """Writes the streams snapshot, if they changed since, and maps them from it"""
+        with self.snapshot_lock:
+            with self.lock:
+                if not self.is_snapshot_stale:
+                    return
+                streams = self.streams
+                metadata = {
+                    "streams_manifest": self.streams_manifest,
+                    "speed_zone_boundaries": self.speed_zone_boundaries,
                 }
+                self.is_snapshot_stale = False
+
+            # Written without the data lock, pages keep refreshing meanwhile
+            mapped_streams = write_streams_snapshot(streams, metadata)
+
+            with self.lock:
+                # The same rows, now shared through the OS page cache, unless
+                # streams changed meanwhile: they are then snapshotted again
+                if self.streams is streams:
+                    self.streams = mapped_streams
+
+    def _load_streams_snapshot(self) -> None:
+        """Starts from the last snapshot, refreshed then as any previous state"""
+        snapshot = read_streams_snapshot()
+        if snapshot is None:
+            return
+
+        streams, metadata = snapshot
+        if tuple(metadata["speed_zone_boundaries"]) != self.speed_zone_boundaries:
+            streams = streams.assign(
+                speed_zone=get_speed_zones(
+                    streams.velocity_smooth, self.speed_zone_boundaries
+                )
             )
-            .pipe(_parse_latlng, activity_id=activity.id)
-            .to_csv(_get_streams_file(activity))
-        )
 
-    # 2.2 Write activities.csv file after, to keep file consistencies
-    pd.DataFrame(
-        [
-            {
-                "id": activity.id,
-                "average_cadence": activity.average_cadence,
-                "average_heartrate": activity.average_heartrate,
-                "average_speed": activity.average_speed.num,
-                "description": activity.description,
-                "distance": activity.distance.num,
-                "elapsed_time": activity.elapsed_time.seconds,
-                "kudos_count": activity.kudos_count,
-                "max_heartrate": activity.max_heartrate,
-                "moving_time": activity.moving_time.seconds,
-                "name": activity.name,
-                "start_date": activity.start_date,
-            }
-            for activity in activities_already_in_cache + activities_to_be_downloaded
-        ]
-    ).to_csv(ACTIVITIES_FILEPATH)
+        self.streams = streams
+        self.activity_zone_totals = get_activity_zone_totals(streams)
+        self.speed_histogram = SpeedHistogram.from_streams(streams)
+        self.streams_offsets = _get_streams_offsets(streams)
+        self.version += 1
+        self.streams_manifest = {
+            int(activity_id): tuple(stat)
+            for activity_id, stat in metadata["streams_manifest"].items()
+        }
+
+
+def _get_activities_streams_manifest(
+    activities: pd.DataFrame,
+) -> dict[int, FileStat]:
+    activity_ids = set() if activities.empty else set(activities.id)
+
+    return {
+        activity_id: stat
+        for activity_id, stat in get_streams_manifest().items()
+        if activity_id in activity_ids
+    }
+
+
+def _diff_manifests(
+    manifest: dict[int, FileStat], new_manifest: dict[int, FileStat]
+) -> tuple[list[int], list[int]]:
+    """IDs of the activities to drop, and to read again: new, changed or deleted"""
+    removed_ids = [
+        activity_id
+        for activity_id, stat in manifest.items()
+        if new_manifest.get(activity_id) != stat
+    ]
+    added_ids = [
+        activity_id
+        for activity_id, stat in new_manifest.items()
+        if manifest.get(activity_id) != stat
+    ]
+
+    return removed_ids, added_ids
+
+
+class _QueriedData:
+    """Per activity zone totals and speed histograms, queried from the stream files.
+
+    The DuckDB backend: streams are never materialized. As for materialized data,
+    only the activities whose file is new or changed are queried on a refresh.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.activity_zone_totals = EMPTY_ACTIVITY_ZONE_TOTALS
+        self.speed_histogram = SpeedHistogram.empty()
+        self.streams_manifest: dict[int, FileStat] = {}
+        self.speed_zone_boundaries: tuple[float, ...] = ()
+        self.version = 0  # incremented on every change, a key for derived data
+
+    def refresh(self, activities: pd.DataFrame) -> None:
+        with self.lock:
+            manifest = _get_activities_streams_manifest(activities)
+            boundaries = get_athlete_speed_zone_boundaries()
+            if boundaries != self.speed_zone_boundaries:
+                self.speed_zone_boundaries = boundaries
+                self.version += 1
+                self.activity_zone_totals = EMPTY_ACTIVITY_ZONE_TOTALS
+                self.speed_histogram = SpeedHistogram.empty()
+                self.streams_manifest = {}
+
+            removed_ids, added_ids = _diff_manifests(self.streams_manifest, manifest)
+            if removed_ids:
+                self.activity_zone_totals = self.activity_zone_totals.loc[
+                    ~self.activity_zone_totals.activity_id.isin(removed_ids)
+                ]
+                self.speed_histogram = self.speed_histogram.drop(removed_ids)
+            if added_ids:
+                new_activity_zone_totals = query_activity_zone_totals(
+                    added_ids, boundaries
+                )
+                self.activity_zone_totals = (
+                    new_activity_zone_totals
+                    if self.activity_zone_totals.empty
+                    else pd.concat(
+                        [self.activity_zone_totals, new_activity_zone_totals],
+                        ignore_index=True,
+                    )
+                )
+                self.speed_histogram = self.speed_histogram.append(
+                    query_speed_histogram(added_ids)
+                )
+            if removed_ids or added_ids:
+                self.version += 1
+            self.streams_manifest = manifest
+
+
+class _BestEffortsData:
+    """Best efforts per activity, read from the metadata of the stream files.
+
+    Computed when streams are written: a refresh after a sync only reads the
+    files that are new or changed, without their streams.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.best_efforts = EMPTY_BEST_EFFORTS
+        self.streams_manifest: dict[int, FileStat] = {}
+        self.version = 0  # incremented on every change, a key for derived data
+
+    def refresh(self, activities: pd.DataFrame) -> None:
+        with self.lock:
+            manifest = _get_activities_streams_manifest(activities)
+            removed_ids, added_ids = _diff_manifests(self.streams_manifest, manifest)
+            if removed_ids:
+                self.best_efforts = self.best_efforts.drop(index=removed_ids)
+            if added_ids:
+                new_best_efforts = read_best_efforts(added_ids)
+                self.best_efforts = (
+                    new_best_efforts
+                    if self.best_efforts.empty
+                    else pd.concat([self.best_efforts, new_best_efforts])
+                )
+            if removed_ids or added_ids:
+                self.version += 1
+            self.streams_manifest = manifest
+
+
+def _enable_copy_on_write() -> None:
+    """Set once for the process, before any frame is loaded to be shared.
+
+    Pages derive new columns from shared frames without copying them, and a write
+    to a derived frame never goes through to the frames of other sessions.
+    """
+    pd.set_option("mode.copy_on_write", True)
+
+
+def create_materialized_data(
+    snapshot_debounce_s: float | None = None,
+) -> _MaterializedData:
+    """Returns activities and streams of their own, out of the app cache.
+
+    For headless use: by default, the streams snapshot is only written on
+    `write_snapshot`.
+    """
+    _enable_copy_on_write()
+    return _MaterializedData(snapshot_debounce_s)
+
+
+def create_queried_data() -> _QueriedData:
+    _enable_copy_on_write()
+    return _QueriedData()
+
+
+def create_best_efforts_data() -> _BestEffortsData:
+    _enable_copy_on_write()
+    return _BestEffortsData()
+
+
+def write_cache_snapshot() -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Loads the cache headless, writing the snapshot the app maps on its first load"""
+    materialized_data = create_materialized_data()
+    activities, streams = materialized_data.refresh()
+    materialized_data.write_snapshot()
+
+    return activities, streams
+
+
+@st.cache_resource
+def _get_materialized_data() -> _MaterializedData:
+    return create_materialized_data(SNAPSHOT_DEBOUNCE_S)
+
+
+@st.cache_resource
+def _get_queried_data() -> _QueriedData:
+    return create_queried_data()
+
+
+@st.cache_resource
+def _get_best_efforts_data() -> _BestEffortsData:
+    return create_best_efforts_data()
+
+
+def load_activities_from_cache() -> pd.DataFrame:
+    """Returns activities, without loading streams: shared, do not mutate them"""
+    return _get_materialized_data().refresh_activities()
+
+
+def load_activity_zone_totals_from_cache() -> pd.DataFrame:
+    """Returns time (s) and distance (km) per (activity_id, speed_zone)"""
+    if QUERY_BACKEND == "duckdb":
+        queried_data = _get_queried_data()
+        queried_data.refresh(load_activities_from_cache())
+        return queried_data.activity_zone_totals
+
+    materialized_data = _get_materialized_data()
+    materialized_data.refresh()
+
+    return materialized_data.activity_zone_totals
+
+
+def load_activity_streams_from_cache(activity_id: int) -> pd.DataFrame:
+    """Returns the streams of a single activity, as a slice of the shared streams.
+
+    With the DuckDB backend, streams are not materialized: they are read from the
+    activity file.
+    """
+    if QUERY_BACKEND == "duckdb":
+        return read_streams([activity_id])
+
+    materialized_data = _get_materialized_data()
+    materialized_data.refresh()
+
+    return materialized_data.get_activity_streams(activity_id)
+
+
+def load_activities_streams_from_cache(activity_ids: list[int]) -> pd.DataFrame:
+    """Returns the streams of several activities, copied out of the shared streams.
+
+    With the DuckDB backend, they are read from the activity files.
+    """
+    if QUERY_BACKEND == "duckdb":
+        return read_streams(activity_ids)
+
+    materialized_data = _get_materialized_data()
+    materialized_data.refresh()
+
+    return materialized_data.get_activities_streams(activity_ids)
+
+
+@functools.lru_cache(maxsize=SMOOTHED_STREAMS_CACHE_SIZE)
+def _get_smoothed_streams(
+    activity_id: int,
+    streams_stat: FileStat | None,
+    column: str,
+    window: int,
+    method: SmoothingMethod,
+) -> np.ndarray:
+    smoothed_streams = smooth(
+        load_activity_streams_from_cache(activity_id), column, window, method
+    )
+    smoothed_streams.flags.writeable = False  # shared between sessions
+
+    return smoothed_streams
+
+
+def load_smoothed_streams_from_cache(
+    activity_id: int, column: str, window: int, method: SmoothingMethod
+) -> np.ndarray:
+    """Returns a stream of an activity, smoothed: shared, do not mutate it.
+
+    Memoized with the least recently used entries evicted first, and keyed on the
+    activity file so that streams downloaded again are smoothed again.
+    """
+    return _get_smoothed_streams(
+        int(activity_id),
+        _get_file_stat(get_streams_file(activity_id)),
+        column,
+        window,
+        method,
+    )
+
+
+def load_speed_histogram_from_cache() -> SpeedHistogram:
+    if QUERY_BACKEND == "duckdb":
+        queried_data = _get_queried_data()
+        queried_data.refresh(load_activities_from_cache())
+        return queried_data.speed_histogram
+
+    materialized_data = _get_materialized_data()
+    materialized_data.refresh()
+
+    return materialized_data.speed_histogram
+
+
+def load_daily_totals_from_cache() -> pd.DataFrame:
+    """Returns distance, moving time and number of activities per day, to roll_up.
+
+    Computed once per data version: shared, do not mutate it.
+    """
+    activities_df = load_activities_from_cache()
+
+    return get_memoized(
+        key=("daily_totals", get_cache_data_version()),
+        compute=lambda: get_daily_totals(activities_df),
+    )
+
+
+def load_daily_zone_totals_from_cache() -> pd.DataFrame:
+    """Returns time (s) and distance (km) per day and speed zone, to roll_up.
+
+    Computed once per data version: shared, do not mutate it.
+    """
+    activities_df = load_activities_from_cache()
+    activity_zone_totals_df = load_activity_zone_totals_from_cache()
+
+    return get_memoized(
+        key=("daily_zone_totals", get_cache_data_version()),
+        compute=lambda: get_daily_zone_totals(activities_df, activity_zone_totals_df),
+    )
+
+
+def load_best_efforts_from_cache() -> pd.DataFrame:
+    """Returns best effort times (s) by activity_id, one column per distance"""
+    best_efforts_data = _get_best_efforts_data()
+    best_efforts_data.refresh(load_activities_from_cache())
+
+    return best_efforts_data.best_efforts
+
+
+def get_cache_data_version() -> tuple[int, int, int]:
+    """Returns a version of the data loaded so far, changed by any refresh changing it"""
+    return (
+        _get_materialized_data().version,
+        _get_queried_data().version,
+        _get_best_efforts_data().version,
+    )
+
+
+def get_cache_memory_usage() -> pd.DataFrame:
+    """Returns the bytes per column of the frames shared between sessions.
 
-    st.success(f"Downloaded data for {len(activities_to_be_downloaded)} activities.")
+    Frames are reported as currently loaded, without refreshing them: streams are
+    only loaded by the first page needing them.
+    """
+    return _get_materialized_data().get_memory_usage()
 
-    # 3. Clear cache and rerun
-    load_data_from_cache.clear()
-    st.success("Cache updated! Reloading app in 3 seconds...")
 
-    time.sleep(3)
-    st.rerun()
+def get_cache_streams_count() -> int:
+    """Returns the number of stream samples currently loaded"""
+    return len(_get_materialized_data().streams)
@@ -0,0 +1,153 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, TypeVar
+
+import requests
+from stravalib import exc
+from stravalib.util.limiter import RateLimiter, get_rates_from_response_headers
+
+T = TypeVar("T")
+
+SHORT_WINDOW_S = 15 * 60  # Strava windows reset every quarter of an hour ...
+LONG_WINDOW_S = 24 * 60 * 60  # ... and at midnight UTC
+
+MAX_RETRIES = 5  # on server and connection errors, per activity
+RETRY_BACKOFF_S = 1.0  # doubled on each retry ...
+MAX_RETRY_BACKOFF_S = 30.0  # ... up to this
+
+
+def _get_window_end(now: float, window_s: int) -> float:
+    return (now // window_s + 1) * window_s
+
+
+class QuotaRateLimiter(RateLimiter):
+    """Tracks Strava 15-minute and daily quotas from the response headers.
+
+    Requests are counted when issued, with `acquire`, so that concurrent workers
+    never overshoot a quota; `acquire` blocks until the exhausted window resets.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._lock = threading.Lock()
+        self.short_limit: int | None = None
+        self.long_limit: int | None = None
+        self.short_usage = 0
+        self.long_usage = 0
+        self.short_window_end = _get_window_end(time.time(), SHORT_WINDOW_S)
+        self.long_window_end = _get_window_end(time.time(), LONG_WINDOW_S)
+        self.paused_until = 0.0
+
+    def _roll_windows(self, now: float) -> None:
+        if now >= self.short_window_end:
+            self.short_usage = 0
+            self.short_window_end = _get_window_end(now, SHORT_WINDOW_S)
+        if now >= self.long_window_end:
+            self.long_usage = 0
+            self.long_window_end = _get_window_end(now, LONG_WINDOW_S)
+
+    def __call__(self, response_headers: dict[str, str]) -> None:
+        rates = get_rates_from_response_headers(response_headers)
+        if rates is None:
+            return
+
+        with self._lock:
+            self._roll_windows(time.time())
+            self.short_limit, self.long_limit = rates.short_limit, rates.long_limit
+            # Local counts include requests still in flight
+            self.short_usage = max(self.short_usage, rates.short_usage)
+            self.long_usage = max(self.long_usage, rates.long_usage)
+
+    def exhaust_short_window(self) -> None:
+        """To be called on a 429 response: waits for the next short window"""
+        with self._lock:
+            self.short_usage = max(self.short_usage, self.short_limit or 0)
+            self.short_limit = self.short_limit or max(self.short_usage, 1)
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.time()
+                self._roll_windows(now)
+
+                if self.long_limit is not None and self.long_usage >= self.long_limit:
+                    self.paused_until = self.long_window_end
+                elif (
+                    self.short_limit is not None
+                    and self.short_usage >= self.short_limit
+                ):
+                    self.paused_until = self.short_window_end
+                else:
+                    self.short_usage += 1
+                    self.long_usage += 1
+                    return
+
+                sleep_s = self.paused_until - now
+
+            time.sleep(min(sleep_s, 1.0))
+
+    def get_pause_remaining(self) -> float:
+        return max(0.0, self.paused_until - time.time())
+
+
+def _is_transient(error: requests.RequestException) -> bool:
+    """Server (5xx) and connection errors, worth retrying, unlike client (4xx) ones"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    return error.response is not None and error.response.status_code >= 500
+
+
+def download_concurrently(
+    fetch: Callable[[int], T],
+    activity_ids: Iterable[int],
+    rate_limiter: QuotaRateLimiter,
+    max_workers: int,
+    on_pause: Callable[[float], None] = lambda _: None,
+) -> Iterator[tuple[int, T]]:
+    """Runs `fetch` for every activity on a bounded pool, yields results as they come.
+
+    Each call waits for the rate limiter quota first, and is retried once the
+    window is reset if Strava answers 429. Server and connection errors are
+    retried up to `MAX_RETRIES` times, with exponential backoff: any other error
+    fails the download. `on_pause` is called from the caller thread with the
+    remaining pause (s) while workers wait for a quota.
+    """
+
+    def fetch_with_quota(activity_id: int) -> T:
+        n_retries = 0
+        while True:
+            rate_limiter.acquire()
+            try:
+                return fetch(activity_id)
+            except exc.Fault as e:
+                if e.response is not None and e.response.status_code == 429:
+                    rate_limiter.exhaust_short_window()
+                    continue
+                if not _is_transient(e) or n_retries >= MAX_RETRIES:
+                    raise
+            except (requests.ConnectionError, requests.Timeout):
+                if n_retries >= MAX_RETRIES:
+                    raise
+
+            time.sleep(min(RETRY_BACKOFF_S * 2**n_retries, MAX_RETRY_BACKOFF_S))
+            n_retries += 1
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(fetch_with_quota, activity_id): activity_id
+            for activity_id in activity_ids
+        }
+        pending = set(futures)
+
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+                if not done and rate_limiter.get_pause_remaining() > 0:
+                    on_pause(rate_limiter.get_pause_remaining())
+
+                for future in done:
+                    yield futures[future], future.result()
+        finally:
+            for future in pending:
+                future.cancel()
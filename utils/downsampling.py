@@ -0,0 +1,124 @@
+import heapq
+from typing import Literal
+
+import numpy as np
+import pandas as pd
+
+EARTH_METERS_PER_DEGREE = 111_320
+
+
+def get_lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of n_out points keeping the shape.
+
+    `x` must be sorted; first and last points are always kept.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 buckets between the first and the last point
+    bucket_edges = np.append(np.linspace(1, n - 1, n_out - 1).astype(np.int64), n)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    selected = 0
+    for i in range(n_out - 2):
+        start, stop = bucket_edges[i], bucket_edges[i + 1]
+        next_stop = bucket_edges[i + 2]
+        next_x, next_y = x[stop:next_stop].mean(), y[stop:next_stop].mean()
+
+        areas = np.abs(
+            (x[selected] - next_x) * (y[start:stop] - y[selected])
+            - (x[selected] - x[start:stop]) * (next_y - y[selected])
+        )
+        selected = start + int(np.argmax(areas))
+        indices[i + 1] = selected
+
+    return indices
+
+
+def get_min_max_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the min and max of n_out / 2 equal buckets, plus both ends"""
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+
+    n_buckets = n_out // 2
+    buckets = np.arange(n) * n_buckets // n
+    # Sorted by bucket then value: a bucket first and last rows are its min and max
+    order = np.lexsort((y, buckets))
+    starts = np.searchsorted(buckets[order], np.arange(n_buckets))
+    stops = np.append(starts[1:], n)
+
+    return np.unique(np.concatenate([[0, n - 1], order[starts], order[stops - 1]]))
+
+
+def downsample(
+    df: pd.DataFrame,
+    x: str,
+    columns: list[str],
+    n_out: int,
+    method: Literal["lttb", "min_max"] = "lttb",
+) -> pd.DataFrame:
+    """Keeps the union of the points selected on each series, NaN values aside"""
+    if len(df) <= n_out:
+        return df
+
+    indices = []
+    for column in columns:
+        positions = np.flatnonzero(df[column].notna().to_numpy())
+        y = df[column].to_numpy(dtype=np.float64, na_value=np.nan)[positions]
+        selected = (
+            get_lttb_indices(df[x].to_numpy(dtype=np.float64)[positions], y, n_out)
+            if method == "lttb"
+            else get_min_max_indices(y, n_out)
+        )
+        indices.append(positions[selected])
+
+    return df.iloc[np.unique(np.concatenate([[0, len(df) - 1], *indices]))]
+
+
+def _get_distances_to_segment(
+    points: np.ndarray, start: np.ndarray, stop: np.ndarray
+) -> np.ndarray:
+    segment = stop - start
+    segment_length_2 = segment @ segment
+    if segment_length_2 == 0:
+        return np.linalg.norm(points - start, axis=1)
+
+    t = np.clip((points - start) @ segment / segment_length_2, 0, 1)
+    return np.linalg.norm(points - (start + t[:, None] * segment), axis=1)
+
+
+def get_route_indices(
+    latitude: np.ndarray, longitude: np.ndarray, n_out: int
+) -> np.ndarray:
+    """Ramer-Douglas-Peucker, refined until n_out points rather than to a tolerance.
+
+    The segment whose farthest point deviates the most (in meters) is split first,
+    so the kept points are always the ones that change the route shape the most.
+    """
+    n = len(latitude)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+
+    x_scale = np.cos(np.radians(np.nanmean(latitude)))
+    points = np.column_stack([longitude * x_scale, latitude]) * EARTH_METERS_PER_DEGREE
+
+    def get_split(start: int, stop: int) -> tuple[float, int, int, int]:
+        distances = _get_distances_to_segment(
+            points[start + 1 : stop], points[start], points[stop]
+        )
+        farthest = start + 1 + int(np.argmax(distances))
+        return -float(distances.max()), start, stop, farthest
+
+    segments = [get_split(0, n - 1)]
+    indices = {0, n - 1}
+    while len(indices) < n_out and segments:
+        _, start, stop, farthest = heapq.heappop(segments)
+        indices.add(farthest)
+        for new_start, new_stop in [(start, farthest), (farthest, stop)]:
+            if new_stop - new_start > 1:
+                heapq.heappush(segments, get_split(new_start, new_stop))
+
+    return np.array(sorted(indices))
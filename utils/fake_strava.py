@@ -0,0 +1,252 @@
+"""Local stand-in for the Strava endpoints used by the app.
+
+`FakeStravaAPI` serves OAuth token exchange and refresh, the athlete, the paginated
+activity list and activity streams from synthetic data, with configurable latency,
+rate-limit headers and error injection. It is plugged into a stravalib client
+through a requests transport adapter, so that no network is involved:
+
+    client = StravaClient(requests_session=get_fake_strava_session(FakeStravaAPI()))
+"""
+import calendar
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from http import HTTPStatus
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+
+from utils.synthetic import (
+    SYNTHETIC_ATHLETE,
+    generate_activities,
+    generate_streams_df,
+)
+
+STRAVA_URL = "https://www.strava.com"
+FAKE_AUTHORIZATION_CODE = "fake-authorization-code"
+
+_ACTIVITY_STREAMS_PATH = re.compile(r"^/api/v3/activities/(\d+)/streams$")
+
+
+class FakeStravaAPI:
+    def __init__(
+        self,
+        activities: list[dict[str, Any]] | None = None,
+        latency_s: float = 0.0,
+        short_limit: int = 200,
+        long_limit: int = 2000,
+        error_rate: float = 0.0,
+        token_ttl_s: int = 6 * 60 * 60,
+        seed: int = 0,
+    ) -> None:
+        self.activities = generate_activities() if activities is None else activities
+        self.latency_s = latency_s
+        self.short_limit = short_limit
+        self.long_limit = long_limit
+        self.error_rate = error_rate
+        self.token_ttl_s = token_ttl_s
+
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._activities_by_id = {
+            activity["id"]: activity for activity in self.activities
+        }
+        self._start_epochs = {
+            activity["id"]: _get_epoch(activity) for activity in self.activities
+        }
+        self._access_tokens: dict[str, int] = {}  # token -> expires_at
+        self._refresh_tokens: set[str] = set()
+        self._usage: dict[tuple[str, int], int] = {}  # (window, index) -> count
+        self.n_requests = 0
+
+    # ------ Transport
+    def handle(
+        self, method: str, url: str
+    ) -> tuple[int, dict[str, str], dict[str, Any] | list[Any]]:
+        """Returns (status code, headers, JSON body) for a request"""
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+        parsed_url = urlparse(url)
+        params = {key: values[-1] for key, values in parse_qs(parsed_url.query).items()}
+
+        if parsed_url.path == "/oauth/token" and method == "POST":
+            return self._post_token(params)
+
+        with self._lock:
+            self.n_requests += 1
+            rate_limit_headers, is_rate_limited = self._count_request()
+            is_failing = self._random.random() < self.error_rate
+
+        if is_rate_limited:
+            return _error(HTTPStatus.TOO_MANY_REQUESTS, rate_limit_headers)
+        if not self._is_authorized(params.get("access_token")):
+            return _error(HTTPStatus.UNAUTHORIZED, rate_limit_headers)
+        if is_failing:
+            return _error(HTTPStatus.INTERNAL_SERVER_ERROR, rate_limit_headers)
+
+        if parsed_url.path == "/api/v3/athlete":
+            return HTTPStatus.OK, rate_limit_headers, SYNTHETIC_ATHLETE
+        if parsed_url.path == "/api/v3/athlete/activities":
+            return HTTPStatus.OK, rate_limit_headers, self._list_activities(params)
+        if match := _ACTIVITY_STREAMS_PATH.match(parsed_url.path):
+            activity = self._activities_by_id.get(int(match.group(1)))
+            if activity is None:
+                return _error(HTTPStatus.NOT_FOUND, rate_limit_headers)
+            return HTTPStatus.OK, rate_limit_headers, _get_streams(activity, params)
+
+        return _error(HTTPStatus.NOT_FOUND, rate_limit_headers)
+
+    # ------ Rate limits
+    def _count_request(self) -> tuple[dict[str, str], bool]:
+        now = time.time()
+        short_key = ("short", int(now // (15 * 60)))
+        long_key = ("long", int(now // (24 * 60 * 60)))
+        self._usage[short_key] = self._usage.get(short_key, 0) + 1
+        self._usage[long_key] = self._usage.get(long_key, 0) + 1
+        short_usage, long_usage = self._usage[short_key], self._usage[long_key]
+
+        headers = {
+            "X-RateLimit-Limit": f"{self.short_limit},{self.long_limit}",
+            "X-RateLimit-Usage": f"{short_usage},{long_usage}",
+        }
+        return headers, short_usage > self.short_limit or long_usage > self.long_limit
+
+    # ------ Endpoints
+    def _post_token(
+        self, params: dict[str, str]
+    ) -> tuple[int, dict[str, str], dict[str, Any]]:
+        with self._lock:
+            is_valid_code = (
+                params.get("grant_type") == "authorization_code"
+                and params.get("code") == FAKE_AUTHORIZATION_CODE
+            )
+            is_valid_refresh_token = (
+                params.get("grant_type") == "refresh_token"
+                and params.get("refresh_token") in self._refresh_tokens
+            )
+            if not is_valid_code and not is_valid_refresh_token:
+                return _error(HTTPStatus.BAD_REQUEST, {})
+
+            self._refresh_tokens.discard(params.get("refresh_token", ""))
+            access_token, refresh_token = secrets.token_hex(20), secrets.token_hex(20)
+            expires_at = int(time.time()) + self.token_ttl_s
+            self._access_tokens[access_token] = expires_at
+            self._refresh_tokens.add(refresh_token)
+
+        return (
+            HTTPStatus.OK,
+            {},
+            {
+                "token_type": "Bearer",
+                "access_token": access_token,
+                "refresh_token": refresh_token,
+                "expires_at": expires_at,
+                "expires_in": self.token_ttl_s,
+                "athlete": SYNTHETIC_ATHLETE,
+            },
+        )
+
+    def _is_authorized(self, access_token: str | None) -> bool:
+        return self._access_tokens.get(access_token or "", 0) > time.time()
+
+    def _list_activities(self, params: dict[str, str]) -> list[dict[str, Any]]:
+        """Newest first, or oldest first when `after` is given, as Strava does"""
+        after = _parse_epoch(params.get("after"))
+        before = _parse_epoch(params.get("before"))
+        page, per_page = int(params.get("page", 1)), int(params.get("per_page", 30))
+
+        activities = [
+            activity
+            for activity in self.activities
+            if (after is None or self._start_epochs[activity["id"]] > after)
+            and (before is None or self._start_epochs[activity["id"]] < before)
+        ]
+        activities.sort(
+            key=lambda activity: self._start_epochs[activity["id"]],
+            reverse=after is None,
+        )
+
+        return activities[(page - 1) * per_page : page * per_page]
+
+
+def _error(
+    status: HTTPStatus, headers: dict[str, str]
+) -> tuple[int, dict[str, str], dict[str, Any]]:
+    return status, headers, {"message": status.phrase, "errors": []}
+
+
+def _get_epoch(activity: dict[str, Any]) -> int:
+    return calendar.timegm(time.strptime(activity["start_date"], "%Y-%m-%dT%H:%M:%SZ"))
+
+
+def _parse_epoch(value: str | None) -> int | None:
+    return None if value is None else int(float(value))
+
+
+def _get_streams(
+    activity: dict[str, Any], params: dict[str, str]
+) -> dict[str, dict[str, Any]]:
+    df = generate_streams_df(activity)
+    data = {
+        "time": df.time.tolist(),
+        "distance": df.distance.tolist(),
+        "heartrate": df.heartrate.tolist(),
+        "cadence": df.cadence.tolist(),
+        "velocity_smooth": df.velocity_smooth.tolist(),
+        "altitude": df.altitude.tolist(),
+        "latlng": df[["latitude", "longitude"]].to_numpy().tolist(),
+        "moving": df.moving.tolist(),
+    }
+    # Strava always sends the distance stream along with the requested ones
+    keys = {"distance", *params.get("keys", "").split(",")}
+
+    return {
+        key: {
+            "type": key,
+            "data": values,
+            "series_type": "distance",
+            "original_size": len(values),
+            "resolution": "high",
+        }
+        for key, values in data.items()
+        if key in keys
+    }
+
+
+class FakeStravaAdapter(BaseAdapter):
+    def __init__(self, api: FakeStravaAPI) -> None:
+        super().__init__()
+        self.api = api
+
+    def send(
+        self, request: requests.PreparedRequest, **kwargs: Any
+    ) -> requests.Response:
+        status, headers, body = self.api.handle(
+            request.method or "GET", request.url or ""
+        )
+
+        response = requests.Response()
+        response.status_code = status
+        response.reason = HTTPStatus(status).phrase
+        response.headers.update({"Content-Type": "application/json", **headers})
+        response._content = json.dumps(body).encode()
+        response.url = request.url or ""
+        response.request = request
+
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def get_fake_strava_session(api: FakeStravaAPI) -> requests.Session:
+    session = requests.Session()
+    session.mount(STRAVA_URL, FakeStravaAdapter(api))
+
+    return session
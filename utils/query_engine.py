@@ -0,0 +1,125 @@
+"""Per activity aggregations, queried by DuckDB right from the stream files.
+
+An alternative to the materialized streams, with STRAVA_QUERY_BACKEND=duckdb: only
+the columns a query needs are read from the Parquet store, on every core, and
+streams are never loaded in memory as a whole. DuckDB is an optional dependency,
+installed with `uv sync --extra duckdb`.
+"""
+import numpy as np
+import pandas as pd
+
+from utils.speed_histogram import (
+    FASTEST_PACE_S,
+    N_PACE_BINS,
+    SLOWEST_PACE_S,
+    SpeedHistogram,
+)
+from utils.stream_store import get_streams_file
+from utils.zones import get_speed_zone_labels
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Files written with wider types (float64 streams) are cast, as by read_streams
+_STREAMS_QUERY = """
+    SELECT activity_id, velocity_smooth::DOUBLE AS speed
+    FROM read_parquet($files, union_by_name = true)
+"""
+
+
+def _query(sql: str, files: list[str], **parameters: float) -> pd.DataFrame:
+    if duckdb is None:
+        raise ImportError(
+            "STRAVA_QUERY_BACKEND=duckdb needs DuckDB: `uv sync --extra duckdb`"
+        )
+
+    with duckdb.connect() as connection:
+        return connection.execute(sql, {"files": files, **parameters}).df()
+
+
+def _get_streams_files(activity_ids: list[int]) -> list[str]:
+    return [
+        str(get_streams_file(activity_id))
+        for activity_id in activity_ids
+        if get_streams_file(activity_id).exists()
+    ]
+
+
+def query_activity_zone_totals(
+    activity_ids: list[int], boundaries: tuple[float, ...]
+) -> pd.DataFrame:
+    """As get_activity_zone_totals: time (s) and distance (km) per activity and zone"""
+    files = _get_streams_files(activity_ids)
+    if not files:
+        return pd.DataFrame(
+            columns=["activity_id", "speed_zone", "duration", "distance_km"]
+        )
+
+    # As get_speed_zones: a speed equal to a boundary falls in the lower zone,
+    # missing speeds in Z1
+    zone_code = " + ".join(
+        f"($boundary_{i} < speed)::INTEGER" for i in range(1, len(boundaries) + 1)
+    )
+    df = _query(
+        f"""
+        SELECT
+            activity_id,
+            CASE WHEN speed IS NULL OR isnan(speed) THEN 0 ELSE {zone_code} END
+                AS zone_code,
+            count(*) AS duration,
+            coalesce(sum(speed) FILTER (WHERE NOT isnan(speed)), 0) / 1000
+                AS distance_km
+        FROM ({_STREAMS_QUERY})
+        GROUP BY ALL
+        ORDER BY ALL
+        """,
+        files,
+        **{f"boundary_{i}": boundary for i, boundary in enumerate(boundaries, start=1)},
+    )
+
+    return pd.DataFrame(
+        {
+            "activity_id": df.activity_id.astype("int64"),
+            "speed_zone": pd.Categorical.from_codes(
+                df.zone_code, categories=get_speed_zone_labels(boundaries), ordered=True
+            ),
+            "duration": df.duration,
+            "distance_km": df.distance_km,
+        }
+    )
+
+
+def query_speed_histogram(activity_ids: list[int]) -> SpeedHistogram:
+    """As SpeedHistogram.from_streams, binned by DuckDB"""
+    files = _get_streams_files(activity_ids)
+    if not files:
+        return SpeedHistogram.empty()
+
+    # As _get_pace_bins: a zero speed is an infinite pace, in the slowest bin
+    df = _query(
+        f"""
+        SELECT
+            activity_id,
+            CASE
+                WHEN speed = 0 THEN {N_PACE_BINS - 1}
+                ELSE least(
+                    greatest(floor(1000 / speed), {FASTEST_PACE_S}), {SLOWEST_PACE_S}
+                ) - {FASTEST_PACE_S}
+            END::INTEGER AS pace_bin,
+            count(*) AS duration,
+            sum(speed) / 1000 AS distance_km
+        FROM ({_STREAMS_QUERY})
+        WHERE NOT isnan(speed)
+        GROUP BY ALL
+        """,
+        files,
+    )
+
+    return SpeedHistogram.from_pace_bin_totals(
+        activity_ids=df.activity_id.to_numpy(dtype=np.int64),
+        pace_bins=df.pace_bin.to_numpy(dtype=np.int64),
+        durations=df.duration.to_numpy(dtype=np.float64),
+        distances_km=df.distance_km.to_numpy(dtype=np.float64),
+    )
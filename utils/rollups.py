@@ -0,0 +1,47 @@
+from typing import Sequence
+
+import pandas as pd
+
+from utils.aggregations import with_start_date
+
+
+def _with_start_day(df: pd.DataFrame) -> pd.DataFrame:
+    return df.assign(start_date=df.start_date.dt.floor("D"))
+
+
+def get_daily_totals(activities_df: pd.DataFrame) -> pd.DataFrame:
+    """Distance (m), moving time (s) and number of activities, per day"""
+    return (
+        _with_start_day(activities_df)
+        .groupby("start_date")
+        .agg(
+            distance=("distance", "sum"),
+            moving_time=("moving_time", "sum"),
+            n_activities=("id", "size"),
+        )
+        .reset_index()
+    )
+
+
+def get_daily_zone_totals(
+    activities_df: pd.DataFrame, activity_zone_totals_df: pd.DataFrame
+) -> pd.DataFrame:
+    """Time (s) and distance (km) spent in each speed zone, per day"""
+    return (
+        _with_start_day(with_start_date(activity_zone_totals_df, activities_df))
+        .groupby(["start_date", "speed_zone"], observed=True)[
+            ["distance_km", "duration"]
+        ]
+        .sum()
+        .reset_index()
+    )
+
+
+def roll_up(
+    daily_df: pd.DataFrame, pd_grouper: pd.Grouper, by: Sequence[str] = ()
+) -> pd.DataFrame:
+    """Sums daily totals per period, labelled as grouping activities would be.
+
+    Periods are whole days, so that summing days gives the sums of their activities.
+    """
+    return daily_df.groupby([pd_grouper, *by], as_index=False, observed=True).sum()
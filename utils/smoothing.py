@@ -0,0 +1,68 @@
+from typing import Literal
+
+import numpy as np
+import pandas as pd
+
+SmoothingMethod = Literal["rolling", "exponential", "time"]
+
+
+def _get_window_means(
+    values: np.ndarray, starts: np.ndarray, stops: np.ndarray
+) -> np.ndarray:
+    """Means of values[start:stop], NaN aside, from cumulative sums: O(n) overall"""
+    is_valid = ~np.isnan(values)
+    cum_sums = np.concatenate([[0.0], np.cumsum(np.where(is_valid, values, 0.0))])
+    cum_counts = np.concatenate([[0], np.cumsum(is_valid)])
+
+    # NaN where a window holds no valid value
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (cum_sums[stops] - cum_sums[starts]) / (
+            cum_counts[stops] - cum_counts[starts]
+        )
+
+
+def get_rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """As `rolling(window, center=True, min_periods=1).mean()`, in O(n)"""
+    positions = np.arange(len(values))
+
+    return _get_window_means(
+        values,
+        starts=np.clip(positions - window // 2, 0, len(values)),
+        stops=np.clip(positions + (window - 1) // 2 + 1, 0, len(values)),
+    )
+
+
+def get_time_rolling_mean(
+    values: np.ndarray, times: np.ndarray, window_s: float
+) -> np.ndarray:
+    """Centered mean over the samples within window_s seconds, `times` sorted.
+
+    Unlike a window of samples, it does not widen over the gaps of paused recordings.
+    """
+    return _get_window_means(
+        values,
+        starts=np.searchsorted(times, times - window_s / 2, side="left"),
+        stops=np.searchsorted(times, times + window_s / 2, side="right"),
+    )
+
+
+def get_exponential_mean(values: np.ndarray, span: int) -> np.ndarray:
+    """Exponentially weighted mean, run forwards then backwards so that it does not lag"""
+    forwards = pd.Series(values).ewm(span=span).mean().to_numpy()
+
+    return pd.Series(forwards[::-1]).ewm(span=span).mean().to_numpy()[::-1]
+
+
+def smooth(
+    streams_df: pd.DataFrame, column: str, window: int, method: SmoothingMethod
+) -> np.ndarray:
+    """Smoothed column, over `window` samples, or seconds for the "time" method"""
+    values = streams_df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    if method == "exponential":
+        return get_exponential_mean(values, span=window)
+    if method == "time":
+        return get_time_rolling_mean(
+            values, streams_df.time.to_numpy(dtype=np.float64), window_s=window
+        )
+    return get_rolling_mean(values, window=window)
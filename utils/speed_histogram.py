@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+
+FASTEST_PACE_S = 150  # s/km, 2:30 /km, faster paces share the first bin
+SLOWEST_PACE_S = 480  # s/km, 8:00 /km, slower paces (and stops) share the last bin
+N_PACE_BINS = SLOWEST_PACE_S - FASTEST_PACE_S + 1
+
+
+def _get_paces(speeds_in_ms: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore"):
+        return 1000 / speeds_in_ms
+
+
+def _get_pace_bins(paces: np.ndarray) -> np.ndarray:
+    """Bin i holds paces in [FASTEST_PACE_S + i, FASTEST_PACE_S + i + 1) s/km"""
+    return (
+        np.clip(np.floor(paces), FASTEST_PACE_S, SLOWEST_PACE_S) - FASTEST_PACE_S
+    ).astype(np.int64)
+
+
+class SpeedHistogram:
+    """Time and distance per activity and pace, at a 1 s/km resolution.
+
+    Histograms are stored as cumulative sums over pace bins, so that the time or
+    distance run within any speed range is two lookups per activity.
+    """
+
+    def __init__(
+        self,
+        activity_ids: np.ndarray,
+        cum_durations: np.ndarray,
+        cum_distances_km: np.ndarray,
+    ) -> None:
+        self.activity_ids = activity_ids
+        self.cum_durations = cum_durations
+        self.cum_distances_km = cum_distances_km
+
+    @classmethod
+    def empty(cls) -> "SpeedHistogram":
+        return cls(
+            activity_ids=np.empty(0, dtype=np.int64),
+            cum_durations=np.empty((0, N_PACE_BINS + 1), dtype=np.int32),
+            cum_distances_km=np.empty((0, N_PACE_BINS + 1), dtype=np.float64),
+        )
+
+    @classmethod
+    def from_streams(cls, streams_df: pd.DataFrame) -> "SpeedHistogram":
+        if streams_df.empty:
+            return cls.empty()
+
+        speeds = streams_df.velocity_smooth.to_numpy(dtype=np.float64)
+        has_speed = ~np.isnan(speeds)
+        activity_codes, activity_ids = pd.factorize(
+            streams_df.activity_id.to_numpy()[has_speed]
+        )
+        speeds = speeds[has_speed]
+
+        flat_bins = activity_codes * N_PACE_BINS + _get_pace_bins(_get_paces(speeds))
+        shape = (len(activity_ids), N_PACE_BINS)
+        durations = np.bincount(flat_bins, minlength=shape[0] * shape[1])
+        distances_km = np.bincount(
+            flat_bins, weights=speeds / 1000, minlength=shape[0] * shape[1]
+        )
+
+        return cls._from_binned_totals(activity_ids, durations, distances_km)
+
+    @classmethod
+    def from_pace_bin_totals(
+        cls,
+        activity_ids: np.ndarray,
+        pace_bins: np.ndarray,
+        durations: np.ndarray,
+        distances_km: np.ndarray,
+    ) -> "SpeedHistogram":
+        """From time and distance totals per (activity, pace bin), in any order"""
+        if len(activity_ids) == 0:
+            return cls.empty()
+
+        activity_codes, unique_activity_ids = pd.factorize(activity_ids)
+        flat_bins = activity_codes * N_PACE_BINS + pace_bins
+        size = len(unique_activity_ids) * N_PACE_BINS
+
+        return cls._from_binned_totals(
+            unique_activity_ids,
+            np.bincount(flat_bins, weights=durations, minlength=size).astype(np.int64),
+            np.bincount(flat_bins, weights=distances_km, minlength=size),
+        )
+
+    @classmethod
+    def _from_binned_totals(
+        cls, activity_ids: np.ndarray, durations: np.ndarray, distances_km: np.ndarray
+    ) -> "SpeedHistogram":
+        """From flat (activity, pace bin) totals, activity major"""
+        shape = (len(activity_ids), N_PACE_BINS)
+
+        def cumulate(values: np.ndarray, dtype: type) -> np.ndarray:
+            cum_values = np.zeros((shape[0], shape[1] + 1), dtype=dtype)
+            np.cumsum(values.reshape(shape), axis=1, out=cum_values[:, 1:])
+            return cum_values
+
+        return cls(
+            activity_ids=np.asarray(activity_ids, dtype=np.int64),
+            cum_durations=cumulate(durations, np.int32),
+            cum_distances_km=cumulate(distances_km, np.float64),
+        )
+
+    def drop(self, activity_ids: list[int]) -> "SpeedHistogram":
+        is_kept = ~np.isin(self.activity_ids, activity_ids)
+
+        return SpeedHistogram(
+            activity_ids=self.activity_ids[is_kept],
+            cum_durations=self.cum_durations[is_kept],
+            cum_distances_km=self.cum_distances_km[is_kept],
+        )
+
+    def append(self, other: "SpeedHistogram") -> "SpeedHistogram":
+        return SpeedHistogram(
+            activity_ids=np.concatenate([self.activity_ids, other.activity_ids]),
+            cum_durations=np.concatenate([self.cum_durations, other.cum_durations]),
+            cum_distances_km=np.concatenate(
+                [self.cum_distances_km, other.cum_distances_km]
+            ),
+        )
+
+    def get_totals(self, min_speed: float, max_speed: float) -> pd.DataFrame:
+        """Time (s) and distance (km) within a speed range (m.s-1), per activity"""
+        # Rounded, so that a pace of exactly N s/km does land in bin N
+        first_bin, last_bin = _get_pace_bins(
+            np.round(_get_paces(np.array([max_speed, min_speed])), 6)
+        )
+
+        return pd.DataFrame(
+            {
+                "activity_id": self.activity_ids,
+                "duration": self.cum_durations[:, last_bin + 1]
+                - self.cum_durations[:, first_bin],
+                "distance_km": self.cum_distances_km[:, last_bin + 1]
+                - self.cum_distances_km[:, first_bin],
+            }
+        )
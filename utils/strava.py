@@ -1,13 +1,27 @@
-import time
+from typing import Any
+
 from stravalib import Client as StravaClient
+from stravalib import exc
 import streamlit as st
 
-from constants import STRAVA_CLIENT_ID, STRAVA_CLIENT_SECRET
+from constants import STRAVA_CLIENT_ID, STRAVA_FAKE_API_YEARS
+from utils.downloader import QuotaRateLimiter
+from utils.fake_strava import FAKE_AUTHORIZATION_CODE
+from utils.strava_tokens import (
+    create_strava_client,
+    exchange_strava_code,
+    refresh_strava_tokens_if_expired,
+)
+
+
+@st.cache_resource
+def get_rate_limiter() -> QuotaRateLimiter:
+    return QuotaRateLimiter()
 
 
 @st.cache_resource
 def _get_strava_client() -> StravaClient:
-    return StravaClient()
+    return create_strava_client(rate_limiter=get_rate_limiter())
 
 
 def get_strava_client() -> StravaClient:
@@ -17,37 +31,35 @@ def get_strava_client() -> StravaClient:
         strava_code = st.query_params.get("code")
         if strava_code:
             try:
-                token_response = client.exchange_code_for_token(
-                    client_id=STRAVA_CLIENT_ID,
-                    client_secret=STRAVA_CLIENT_SECRET,
-                    code=strava_code,
-                )
-                client.access_token = token_response["access_token"]
-                client.refresh_token = token_response["refresh_token"]
-                client.expires_at = token_response["expires_at"]
+                exchange_strava_code(client, strava_code)
             except Exception:
                 st.query_params.clear()
                 st.rerun()
     else:
-        if time.time() > client.expires_at:
-            token_response = client.refresh_access_token(
-                client_id=STRAVA_CLIENT_ID,
-                client_secret=STRAVA_CLIENT_SECRET,
-                refresh_token=client.refresh_token,
-            )
-            client.access_token = token_response["access_token"]
-            client.refresh_token = token_response["refresh_token"]
-            client.expires_at = token_response["expires_at"]
+        try:
+            refresh_strava_tokens_if_expired(client)
+        except exc.Fault:  # revoked, e.g. the app access removed on Strava
+            client.access_token = None
 
     return client
 
 
+@st.cache_resource
+def get_strava_athlete(access_token: str) -> Any:
+    """Cached per access token, as the home page reruns while polling syncs"""
+    return _get_strava_client().get_athlete()
+
+
 def st_strava_authorization_button(label: str, redirect_uri: str) -> None:
     client = _get_strava_client()
 
-    strava_authorization_url = client.authorization_url(
-        client_id=STRAVA_CLIENT_ID,
-        redirect_uri=redirect_uri,
+    strava_authorization_url = (
+        f"{redirect_uri}?code={FAKE_AUTHORIZATION_CODE}"
+        if STRAVA_FAKE_API_YEARS
+        else client.authorization_url(
+            client_id=STRAVA_CLIENT_ID,
+            redirect_uri=redirect_uri,
+        )
     )
 
     st.markdown(
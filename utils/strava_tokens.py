@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from typing import Any, Callable, TypeVar
+
+from stravalib import Client as StravaClient
+from stravalib import exc
+import yaml
+
+from constants import (
+    DATA_PATH,
+    STRAVA_CLIENT_ID,
+    STRAVA_CLIENT_SECRET,
+    STRAVA_FAKE_API_YEARS,
+)
+from utils.downloader import QuotaRateLimiter
+from utils.fake_strava import (
+    FAKE_AUTHORIZATION_CODE,
+    FakeStravaAPI,
+    get_fake_strava_session,
+)
+from utils.synthetic import generate_activities
+
+T = TypeVar("T")
+
+STRAVA_TOKENS_FILEPATH = DATA_PATH / "strava_tokens.yaml"
+TOKEN_EXPIRY_MARGIN_S = 5 * 60  # refreshed a bit early, not to expire in flight
+
+# Download workers share a client: one of them refreshes its tokens at a time
+_refresh_lock = threading.Lock()
+
+
+def create_strava_client(rate_limiter: QuotaRateLimiter) -> StravaClient:
+    """A client of the Strava API, or of its local fake if enabled"""
+    if STRAVA_FAKE_API_YEARS:
+        return StravaClient(
+            rate_limiter=rate_limiter,
+            requests_session=get_fake_strava_session(
+                FakeStravaAPI(generate_activities(n_years=STRAVA_FAKE_API_YEARS))
+            ),
+        )
+
+    return StravaClient(rate_limiter=rate_limiter)
+
+
+def load_strava_tokens() -> dict[str, Any]:
+    if not STRAVA_TOKENS_FILEPATH.exists():
+        return {}
+
+    with open(STRAVA_TOKENS_FILEPATH) as f:
+        return yaml.safe_load(f) or {}
+
+
+def _use_strava_tokens(strava_client: StravaClient, tokens: dict[str, Any]) -> None:
+    strava_client.access_token = tokens["access_token"]
+    strava_client.refresh_token = tokens["refresh_token"]
+    strava_client.expires_at = tokens["expires_at"]
+
+
+def set_strava_tokens(strava_client: StravaClient, tokens: dict[str, Any]) -> None:
+    """Sets the tokens of a token response, stored for the CLI to sync unattended"""
+    _use_strava_tokens(strava_client, tokens)
+    if STRAVA_FAKE_API_YEARS:  # would overwrite the tokens of the real API
+        return
+
+    DATA_PATH.mkdir(exist_ok=True)
+    tmp_filepath = STRAVA_TOKENS_FILEPATH.with_suffix(".yaml.tmp")
+    # Readable by the owner only: a refresh token grants access to the account
+    with open(
+        os.open(tmp_filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w"
+    ) as f:
+        yaml.safe_dump(
+            {
+                key: tokens[key]
+                for key in ["access_token", "refresh_token", "expires_at"]
+            },
+            f,
+        )
+    os.replace(tmp_filepath, STRAVA_TOKENS_FILEPATH)
+
+
+def exchange_strava_code(strava_client: StravaClient, code: str) -> None:
+    set_strava_tokens(
+        strava_client,
+        strava_client.exchange_code_for_token(
+            client_id=STRAVA_CLIENT_ID,
+            client_secret=STRAVA_CLIENT_SECRET,
+            code=code,
+        ),
+    )
+
+
+def _is_expiring(strava_client: StravaClient) -> bool:
+    return time.time() > strava_client.expires_at - TOKEN_EXPIRY_MARGIN_S
+
+
+def _refresh_strava_tokens(
+    strava_client: StravaClient, is_stale: Callable[[], bool]
+) -> None:
+    with _refresh_lock:
+        # Refreshed meanwhile by another worker, or by another process: the app
+        # and the CLI share the stored tokens, and a refresh rotates them
+        stored_tokens = {} if STRAVA_FAKE_API_YEARS else load_strava_tokens()
+        if (
+            stored_tokens
+            and stored_tokens["refresh_token"] != strava_client.refresh_token
+        ):
+            _use_strava_tokens(strava_client, stored_tokens)
+        if not is_stale():
+            return
+
+        set_strava_tokens(
+            strava_client,
+            strava_client.refresh_access_token(
+                client_id=STRAVA_CLIENT_ID,
+                client_secret=STRAVA_CLIENT_SECRET,
+                refresh_token=strava_client.refresh_token,
+            ),
+        )
+
+
+def refresh_strava_tokens_if_expired(strava_client: StravaClient) -> None:
+    if _is_expiring(strava_client):
+        _refresh_strava_tokens(
+            strava_client, is_stale=lambda: _is_expiring(strava_client)
+        )
+
+
+def call_with_fresh_tokens(strava_client: StravaClient, call: Callable[[], T]) -> T:
+    """Calls the API with tokens refreshed if expired, and once more on a 401.
+
+    For long syncs: they outlive access tokens, e.g. while waiting for a quota.
+    """
+    refresh_strava_tokens_if_expired(strava_client)
+    access_token = strava_client.access_token
+    try:
+        return call()
+    except exc.AccessUnauthorized:
+        _refresh_strava_tokens(
+            strava_client,
+            is_stale=lambda: strava_client.access_token == access_token,
+        )
+        return call()
+
+
+def authorize_from_stored_tokens(strava_client: StravaClient) -> bool:
+    """Authorizes with the tokens stored by the last login to the app, if any.
+
+    The local fake of the Strava API lives in the app process: it is authorized
+    with its fake code instead.
+    """
+    if STRAVA_FAKE_API_YEARS:
+        exchange_strava_code(strava_client, FAKE_AUTHORIZATION_CODE)
+        return True
+
+    tokens = load_strava_tokens()
+    if not tokens:
+        return False
+
+    _use_strava_tokens(strava_client, tokens)
+    refresh_strava_tokens_if_expired(strava_client)
+
+    return True
@@ -0,0 +1,264 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from constants import DATA_PATH
+from utils.best_efforts import BEST_EFFORT_DISTANCES_M, get_best_times
+
+STREAMS_PATH = DATA_PATH / "streams"
+STREAMS_SNAPSHOT_FILEPATH = DATA_PATH / "streams.arrow"
+
+FileStat = tuple[int, int]  # (size in bytes, mtime in ns)
+
+# Compact types, both on disk and in memory: float32 keeps coordinates to the meter
+STREAMS_SCHEMA = pa.schema(
+    [
+        ("time", pa.int32()),
+        ("heartrate", pa.uint8()),
+        ("cadence", pa.uint8()),
+        ("velocity_smooth", pa.float32()),
+        ("altitude", pa.float32()),
+        ("latitude", pa.float32()),
+        ("longitude", pa.float32()),
+        ("moving", pa.bool_()),
+        ("distance", pa.float32()),
+        ("activity_id", pa.int64()),
+    ]
+)
+# Nullable pandas types, so that missing samples do not turn columns into float64
+_PANDAS_TYPES = {pa.uint8(): pd.UInt8Dtype(), pa.bool_(): pd.BooleanDtype()}
+
+
+def _is_latlng(sample: object) -> bool:
+    try:
+        latitude, longitude = map(float, sample)
+    except (TypeError, ValueError):
+        return False
+
+    return True
+
+
+def parse_latlng(df: pd.DataFrame) -> tuple[pd.DataFrame, list[int]]:
+    """Splits the latlng stream into float latitude and longitude columns.
+
+    Returns the frame and the positions of the malformed samples, left to NaN.
+    """
+    if "latlng" not in df.columns:
+        return df, []
+
+    samples = df.latlng.tolist()
+    latlng = np.full((len(samples), 2), np.nan)
+    malformed: list[int] = []
+
+    try:
+        latlng[:] = np.array(samples, dtype=np.float64).reshape(len(samples), 2)
+    except (TypeError, ValueError):
+        is_valid = np.array([_is_latlng(sample) for sample in samples], dtype=bool)
+        if is_valid.any():
+            latlng[is_valid] = np.array(
+                [sample for sample, valid in zip(samples, is_valid) if valid],
+                dtype=np.float64,
+            )
+        malformed = np.flatnonzero(~is_valid).tolist()
+
+    return (
+        df.drop(columns=["latlng"]).assign(
+            latitude=latlng[:, 0], longitude=latlng[:, 1]
+        ),
+        malformed,
+    )
+
+
+def get_streams_file(activity_id: int) -> Path:
+    return STREAMS_PATH / f"{activity_id}.parquet"
+
+
+def _to_streams_table(df: pd.DataFrame, activity_id: int) -> pa.Table:
+    df = df.assign(activity_id=activity_id)
+
+    return pa.Table.from_arrays(
+        [
+            pa.array(df[field.name], type=field.type, from_pandas=True)
+            if field.name in df.columns
+            else pa.nulls(len(df), type=field.type)
+            for field in STREAMS_SCHEMA
+        ],
+        schema=STREAMS_SCHEMA,
+    )
+
+
+def _get_best_efforts(table: pa.Table) -> dict[str, float | None]:
+    return dict(
+        zip(
+            BEST_EFFORT_DISTANCES_M,
+            get_best_times(
+                table.column("distance").to_numpy(zero_copy_only=False),
+                table.column("time").to_numpy(zero_copy_only=False),
+            ),
+        )
+    )
+
+
+def write_activity_streams(df: pd.DataFrame, activity_id: int) -> None:
+    """Writes the streams of an activity, replacing its file atomically.
+
+    Best efforts are computed once here, and kept in the file metadata.
+    """
+    STREAMS_PATH.mkdir(parents=True, exist_ok=True)
+    streams_file = get_streams_file(activity_id)
+    # Per process and thread: a migration of the app and a sync may both write one
+    tmp_filepath = streams_file.with_suffix(
+        f".parquet.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    table = _to_streams_table(df, activity_id)
+    table = table.replace_schema_metadata(
+        {b"best_efforts": json.dumps(_get_best_efforts(table))}
+    )
+    pq.write_table(table, tmp_filepath)
+    os.replace(tmp_filepath, streams_file)
+
+
+def read_streams(activity_ids: list[int]) -> pd.DataFrame:
+    """Reads the streams of all given activities at once, as a single dataset"""
+    files = [
+        str(get_streams_file(activity_id))
+        for activity_id in activity_ids
+        if get_streams_file(activity_id).exists()
+    ]
+    # Files written with wider types (float64 streams) are cast on read
+    table = (
+        ds.dataset(files, schema=STREAMS_SCHEMA, format="parquet").to_table()
+        if files
+        else STREAMS_SCHEMA.empty_table()
+    )
+
+    # Dictionary encoded, activity IDs come out as a pandas categorical
+    activity_id_index = table.schema.get_field_index("activity_id")
+    table = table.set_column(
+        activity_id_index,
+        "activity_id",
+        table.column(activity_id_index).dictionary_encode(),
+    )
+
+    return table.to_pandas(types_mapper=_PANDAS_TYPES.get)
+
+
+def read_best_efforts(activity_ids: list[int]) -> pd.DataFrame:
+    """Best effort times (s) per activity, one column per distance.
+
+    Read from the file metadata, without the streams. Files written before, or
+    with other distances, have theirs computed from their distance and time.
+    """
+    best_efforts = {}
+    for activity_id in activity_ids:
+        streams_file = get_streams_file(activity_id)
+        if not streams_file.exists():
+            continue
+
+        metadata = pq.read_schema(streams_file).metadata or {}
+        activity_best_efforts = json.loads(metadata.get(b"best_efforts", b"{}"))
+        if activity_best_efforts.keys() != BEST_EFFORT_DISTANCES_M.keys():
+            activity_best_efforts = _get_best_efforts(
+                pq.read_table(streams_file, columns=["distance", "time"])
+            )
+        best_efforts[activity_id] = activity_best_efforts
+
+    return pd.DataFrame.from_dict(
+        best_efforts,
+        orient="index",
+        columns=list(BEST_EFFORT_DISTANCES_M),
+        dtype=float,
+    ).rename_axis("activity_id")
+
+
+def get_streams_manifest() -> dict[int, FileStat]:
+    """Maps every activity ID in the store to the size and mtime of its file"""
+    if not STREAMS_PATH.exists():
+        return {}
+
+    manifest = {}
+    with os.scandir(STREAMS_PATH) as entries:
+        for entry in entries:
+            stem, extension = os.path.splitext(entry.name)
+            if extension == ".parquet" and stem.isdigit():
+                stat = entry.stat()
+                manifest[int(stem)] = (stat.st_size, stat.st_mtime_ns)
+
+    return manifest
+
+
+# ------ Snapshot of the materialized streams, memory-mapped by the app
+def _map_streams_snapshot() -> tuple[pd.DataFrame, dict[str, Any]]:
+    table = pa.ipc.open_file(pa.memory_map(str(STREAMS_SNAPSHOT_FILEPATH))).read_all()
+
+    return (
+        table.to_pandas(split_blocks=True),
+        json.loads(table.schema.metadata[b"snapshot"]),
+    )
+
+
+def write_streams_snapshot(
+    streams: pd.DataFrame, metadata: dict[str, Any]
+) -> pd.DataFrame:
+    """Writes streams to an uncompressed Arrow IPC file, replaced atomically.
+
+    Returns the streams memory-mapped from the written file.
+    """
+    table = pa.Table.from_pandas(streams, preserve_index=False)
+    # NaN are kept as values rather than nulls, so that floats map without a copy
+    for i, field in enumerate(table.schema):
+        if pa.types.is_floating(field.type):
+            table = table.set_column(i, field, pa.array(streams[field.name].to_numpy()))
+    table = table.replace_schema_metadata(
+        {**table.schema.metadata, b"snapshot": json.dumps(metadata)}
+    )
+
+    # Per process, as the app and the sync CLI may both write one
+    tmp_filepath = STREAMS_SNAPSHOT_FILEPATH.with_suffix(f".arrow.{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp_filepath), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_filepath, STREAMS_SNAPSHOT_FILEPATH)
+
+    return _map_streams_snapshot()[0]
+
+
+def read_streams_snapshot() -> tuple[pd.DataFrame, dict[str, Any]] | None:
+    """Returns the memory-mapped streams and their metadata, if there is a snapshot.
+
+    Columns without nulls are read-only views on the file: they are shared with
+    other processes through the OS page cache, and must never be mutated.
+    """
+    if not STREAMS_SNAPSHOT_FILEPATH.exists():
+        return None
+
+    try:
+        return _map_streams_snapshot()
+    except (pa.ArrowInvalid, KeyError):
+        return None
+
+
+# ------ Migration from the legacy one-CSV-per-activity cache
+def _get_legacy_streams_files() -> list[Path]:
+    return [path for path in DATA_PATH.glob("*.csv") if path.stem.isdigit()]
+
+
+def migrate_csv_cache() -> int:
+    """Converts legacy cache/<activity_id>.csv files to parquet, returns the count"""
+    legacy_files = _get_legacy_streams_files()
+
+    for legacy_file in legacy_files:
+        write_activity_streams(
+            pd.read_csv(legacy_file, index_col=0), activity_id=int(legacy_file.stem)
+        )
+        legacy_file.unlink()
+
+    return len(legacy_files)
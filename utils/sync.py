@@ -0,0 +1,308 @@
+"""Strava sync pipeline, free of any UI.
+
+Progress is reported as events, `report(event, **fields)`: the background sync
+worker turns them into a progress pages can poll, the CLI into JSON logs.
+"""
+import datetime
+import fcntl
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Callable, Iterator
+
+import pandas as pd
+from stravalib import Client as StravaClient
+
+from constants import (
+    DATA_PATH,
+    DOWNLOAD_MAX_WORKERS,
+    STRAVA_FIRST_ACTIVITY_START_DATE,
+    STRAVA_RUN_SPORT_TYPES,
+    STRAVA_STREAM_TYPES,
+)
+from utils.activity_store import (
+    close_sync_journal,
+    commit_to_sync_journal,
+    is_full_sync_due,
+    load_sync_state,
+    read_activities,
+    read_sync_journal,
+    start_sync_journal,
+)
+from utils.downloader import QuotaRateLimiter, download_concurrently
+from utils.strava_tokens import call_with_fresh_tokens
+from utils.stream_store import (
+    get_streams_file,
+    migrate_csv_cache,
+    parse_latlng,
+    write_activity_streams,
+)
+
+Reporter = Callable[..., None]
+
+SYNC_LOCK_FILEPATH = DATA_PATH / "sync.lock"
+
+
+def _download_activity_streams(
+    strava_client: StravaClient, activity_id: int
+) -> list[int]:
+    """Writes the streams of an activity, returns its malformed lat/lng samples"""
+    activity_streams = call_with_fresh_tokens(
+        strava_client,
+        lambda: strava_client.get_activity_streams(
+            activity_id=activity_id,
+            types=STRAVA_STREAM_TYPES,
+        ),
+    )
+
+    df, malformed_latlng_samples = parse_latlng(
+        pd.DataFrame(
+            {
+                key: activity_streams[key].data
+                for key in ["distance", *STRAVA_STREAM_TYPES]
+                if key in activity_streams.keys()
+            }
+        )
+    )
+    write_activity_streams(df, activity_id=activity_id)
+
+    return malformed_latlng_samples
+
+
+def _get_activity_summary(activity: Any) -> dict[str, Any]:
+    return {
+        "id": activity.id,
+        "average_cadence": activity.average_cadence,
+        "average_heartrate": activity.average_heartrate,
+        "average_speed": activity.average_speed.num,
+        "description": activity.description,
+        "distance": activity.distance.num,
+        "elapsed_time": activity.elapsed_time.seconds,
+        "kudos_count": activity.kudos_count,
+        "max_heartrate": activity.max_heartrate,
+        "moving_time": activity.moving_time.seconds,
+        "name": activity.name,
+        "start_date": activity.start_date,
+    }
+
+
+def _get_edited_ids(
+    activities_df: pd.DataFrame, summaries: list[dict[str, Any]]
+) -> list[int]:
+    """IDs of the activities whose distance or duration changed, e.g. cropped"""
+    if activities_df.empty:
+        return []
+
+    known_activities = activities_df.set_index("id")
+    return [
+        summary["id"]
+        for summary in summaries
+        if summary["id"] in known_activities.index
+        and (
+            known_activities.at[summary["id"], "distance"],
+            known_activities.at[summary["id"], "moving_time"],
+        )
+        != (summary["distance"], summary["moving_time"])
+    ]
+
+
+def _plan_sync(
+    strava_client: StravaClient,
+    full: bool,
+    date_range: tuple[datetime.datetime | None, datetime.datetime | None] | None,
+    report: Reporter,
+) -> dict[str, Any]:
+    """Lists activities to sync, and starts the journal with the sync plan"""
+    sync_state = load_sync_state()
+    full = date_range is None and (full or is_full_sync_due(sync_state))
+    known_activities_df = read_activities()
+
+    # 1. List activities, since the last synced one on incremental syncs
+    if date_range is not None:
+        after, before = date_range
+        after = after or STRAVA_FIRST_ACTIVITY_START_DATE
+    else:
+        after = (
+            STRAVA_FIRST_ACTIVITY_START_DATE if full else sync_state["last_start_date"]
+        )
+        before = None
+    report("listing", full=full, after=after, before=before)
+    listed_activities = call_with_fresh_tokens(
+        strava_client,
+        lambda: list(
+            strava_client.get_activities(after=after, before=before, limit=None)
+        ),
+    )
+    summaries = [
+        _get_activity_summary(activity)
+        for activity in listed_activities
+        if activity.sport_type in STRAVA_RUN_SPORT_TYPES
+    ]
+    report("listed", n_activities=len(summaries))
+
+    # 2. Reconcile deleted and edited activities, on full syncs
+    deleted_ids, edited_ids = [], []
+    if full and not known_activities_df.empty:
+        listed_ids = {summary["id"] for summary in summaries}
+        deleted_ids = [
+            activity_id
+            for activity_id in known_activities_df.id.tolist()
+            if activity_id not in listed_ids
+        ]
+        edited_ids = _get_edited_ids(known_activities_df, summaries)
+        for activity_id in deleted_ids + edited_ids:
+            get_streams_file(activity_id).unlink(missing_ok=True)
+        report("reconciled", n_deleted=len(deleted_ids), n_edited=len(edited_ids))
+
+    # 3. Streams to download, of new and already known activities
+    known_ids = [] if known_activities_df.empty else known_activities_df.id.tolist()
+    activity_ids = [summary["id"] for summary in summaries] + [
+        activity_id for activity_id in known_ids if activity_id not in deleted_ids
+    ]
+
+    # 4. Watermark, moved once the sync is complete, but not by date ranges that
+    # may leave activities out before it
+    start_dates = [activity.start_date for activity in listed_activities]
+    if not full:
+        start_dates.append(
+            datetime.datetime.fromisoformat(sync_state["last_start_date"])
+        )
+    synced_state = (
+        {"last_start_date": max(start_dates).isoformat()}
+        if start_dates and date_range is None
+        else {}
+    )
+    if full:
+        synced_state["last_full_sync_at"] = datetime.datetime.now(
+            datetime.timezone.utc
+        ).isoformat()
+
+    plan = {
+        "summaries": summaries,
+        "deleted_ids": deleted_ids,
+        "download_ids": [
+            activity_id
+            for activity_id in dict.fromkeys(activity_ids)
+            if not get_streams_file(activity_id).exists()
+        ],
+        "sync_state": synced_state,
+    }
+    start_sync_journal(plan)
+
+    return plan
+
+
+def _run_sync(
+    strava_client: StravaClient,
+    plan: dict[str, Any],
+    committed_ids: set[int],
+    rate_limiter: QuotaRateLimiter,
+    max_workers: int,
+    report: Reporter,
+) -> int:
+    """Downloads the streams of a plan, committing each activity to the journal"""
+    activity_ids_to_be_downloaded = []
+    for activity_id in plan["download_ids"]:
+        if activity_id in committed_ids:
+            continue
+        # Stream files are written atomically: an existing one is complete, it was
+        # only interrupted before its commit
+        if get_streams_file(activity_id).exists():
+            commit_to_sync_journal(activity_id)
+        else:
+            activity_ids_to_be_downloaded.append(activity_id)
+
+    n_total = len(activity_ids_to_be_downloaded)
+    report("downloading", n_total=n_total)
+
+    downloads = download_concurrently(
+        fetch=partial(_download_activity_streams, strava_client),
+        activity_ids=activity_ids_to_be_downloaded,
+        rate_limiter=rate_limiter,
+        max_workers=max_workers,
+        on_pause=lambda remaining_s: report("rate_limited", remaining_s=remaining_s),
+    )
+    for n_done, (activity_id, malformed_latlng_samples) in enumerate(downloads, 1):
+        commit_to_sync_journal(activity_id)
+        if malformed_latlng_samples:
+            report(
+                "malformed_latlng",
+                activity_id=activity_id,
+                n_samples=len(malformed_latlng_samples),
+                positions=malformed_latlng_samples[:10],
+            )
+        report("downloaded", activity_id=activity_id, n_done=n_done, n_total=n_total)
+
+    close_sync_journal()
+
+    return n_total
+
+
+def _ignore(event: str, **fields: Any) -> None:
+    pass
+
+
+@contextmanager
+def _lock_sync(report: Reporter) -> Iterator[None]:
+    """Syncs of the app and of the CLI share the journal: they run one at a time"""
+    with open(SYNC_LOCK_FILEPATH, "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            report("waiting_for_lock")
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def sync(
+    strava_client: StravaClient,
+    rate_limiter: QuotaRateLimiter,
+    full: bool = False,
+    after: datetime.datetime | None = None,
+    before: datetime.datetime | None = None,
+    max_workers: int = DOWNLOAD_MAX_WORKERS,
+    report: Reporter = _ignore,
+) -> int:
+    """Syncs activities started after the last synced one, all of them, or a range.
+
+    A full sync also runs every STRAVA_FULL_SYNC_INTERVAL_DAYS: it removes the
+    activities deleted from Strava, and downloads again the edited ones. Syncs of
+    a date range, `after` and/or `before`, only add or update its activities.
+
+    Syncs are journaled: each activity is visible to the app as soon as its
+    streams are downloaded, and an interrupted sync is resumed by the next one.
+    Returns the number of downloaded activities.
+    """
+    DATA_PATH.mkdir(exist_ok=True)
+    date_range = None if after is None and before is None else (after, before)
+    n_downloaded = 0
+
+    with _lock_sync(report):
+        migrate_csv_cache()
+
+        # 1. Resume an interrupted sync, without listing its activities again
+        plan, committed_ids = read_sync_journal()
+        if plan is not None:
+            report(
+                "resuming",
+                n_committed=len(committed_ids),
+                n_planned=len(plan["download_ids"]),
+            )
+            n_downloaded += _run_sync(
+                strava_client, plan, committed_ids, rate_limiter, max_workers, report
+            )
+
+        # 2. Sync new activities
+        n_downloaded += _run_sync(
+            strava_client,
+            _plan_sync(strava_client, full, date_range, report),
+            committed_ids=set(),
+            rate_limiter=rate_limiter,
+            max_workers=max_workers,
+            report=report,
+        )
+    report("synced", n_downloaded=n_downloaded)
+
+    return n_downloaded
@@ -0,0 +1,111 @@
+"""Syncs the cache with Strava without the app, e.g. from cron to pre-warm it.
+
+Run from the repository root: `uv run python -m utils.sync_cli`
+
+Authorizes with the Strava tokens stored by the last login to the app. Progress is
+logged as JSON lines on stdout; the exit code is 1 when the sync failed, and 2 when
+no tokens are stored. A sync interrupted by the rate limits or a crash is resumed
+by the next one.
+"""
+import argparse
+import datetime
+import json
+import sys
+import time
+from typing import Any
+
+from constants import DOWNLOAD_MAX_WORKERS
+from utils.downloader import QuotaRateLimiter
+from utils.strava_tokens import authorize_from_stored_tokens, create_strava_client
+from utils.sync import sync
+
+WARNING_EVENTS = ["waiting_for_lock", "rate_limited", "malformed_latlng"]
+
+
+def _log(event: str, **fields: Any) -> None:
+    level = "warning" if event in WARNING_EVENTS else fields.pop("level", "info")
+    print(
+        json.dumps(
+            {
+                "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "level": level,
+                "event": event,
+                **fields,
+            },
+            default=str,
+        ),
+        flush=True,
+    )
+
+
+def _parse_date(value: str) -> datetime.datetime:
+    """An ISO date or datetime, UTC unless it has an offset"""
+    date = datetime.datetime.fromisoformat(value)
+    return date if date.tzinfo else date.replace(tzinfo=datetime.timezone.utc)
+
+
+def _write_streams_snapshot() -> None:
+    """Loads the cache once, leaving the snapshot the app maps on its first load"""
+    from utils.data_cache import write_cache_snapshot  # imports Streamlit
+
+    start = time.perf_counter()
+    activities_df, streams_df = write_cache_snapshot()
+    _log(
+        "snapshot_written",
+        n_activities=len(activities_df),
+        n_samples=len(streams_df),
+        duration_s=round(time.perf_counter() - start, 2),
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="list all activities, removing deleted ones and downloading edited ones",
+    )
+    parser.add_argument(
+        "--after", type=_parse_date, help="only sync activities started after"
+    )
+    parser.add_argument(
+        "--before", type=_parse_date, help="only sync activities started before"
+    )
+    parser.add_argument("--max-workers", type=int, default=DOWNLOAD_MAX_WORKERS)
+    parser.add_argument(
+        "--no-snapshot",
+        action="store_true",
+        help="do not write the streams snapshot once synced",
+    )
+    args = parser.parse_args()
+    if args.full and (args.after or args.before):
+        parser.error("--full syncs all activities, it takes no date range")
+
+    rate_limiter = QuotaRateLimiter()
+    strava_client = create_strava_client(rate_limiter=rate_limiter)
+    try:
+        # Refreshes expired tokens: fails on a network error, or revoked tokens
+        if not authorize_from_stored_tokens(strava_client):
+            _log("unauthorized", level="error", message="Log in to the app once first")
+            return 2
+
+        sync(
+            strava_client,
+            rate_limiter,
+            full=args.full,
+            after=args.after,
+            before=args.before,
+            max_workers=args.max_workers,
+            report=_log,
+        )
+        if not args.no_snapshot:
+            _write_streams_snapshot()
+    except Exception as e:
+        _log("failed", level="error", error=repr(e))
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
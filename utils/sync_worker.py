@@ -0,0 +1,126 @@
+import queue
+import threading
+import time
+from typing import Any
+
+from stravalib import Client as StravaClient
+import streamlit as st
+
+from utils.downloader import QuotaRateLimiter
+from utils.strava import get_rate_limiter
+from utils.strava_tokens import refresh_strava_tokens_if_expired
+from utils.sync import sync
+
+SYNC_EVENT_MESSAGES = {
+    "resuming": "Resuming interrupted sync: {n_committed} of {n_planned} activities "
+    "already downloaded.",
+    "waiting_for_lock": "Waiting for another sync, e.g. from the CLI ...",
+    "listing": "Listing activities after {after} (full sync: {full}) ...",
+    "listed": "Found {n_activities} new or updated activities.",
+    "reconciled": "{n_deleted} deleted and {n_edited} edited activities.",
+    "downloading": "Downloading data for {n_total} activities ...",
+    "downloaded": "Downloaded data for {n_done} of {n_total} activities ...",
+    "rate_limited": "Strava rate limit reached, resuming in {remaining_s:.0f}s ...",
+    "malformed_latlng": "{n_samples} malformed lat/lng samples for activity "
+    "ID={activity_id}, at positions {positions}",
+    "synced": "Cache updated! Downloaded data for {n_downloaded} activities.",
+}
+
+
+class SyncJob:
+    """A sync and its progress, as last reported by the pipeline"""
+
+    def __init__(self, full: bool) -> None:
+        self.full = full
+        self.status = "queued"  # then "running", and "done" or "failed"
+        self.message = "Waiting for the sync worker ..."
+        self.n_done = 0
+        self.n_total = 0
+        self.warnings: list[str] = []
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def report(self, event: str, **fields: Any) -> None:
+        message = SYNC_EVENT_MESSAGES[event].format(**fields)
+        if event == "malformed_latlng":
+            self.warnings.append(message)
+            return
+
+        if event == "downloading":
+            self.n_done, self.n_total = 0, fields["n_total"]
+        elif event == "downloaded":
+            self.n_done = fields["n_done"]
+        self.message = message
+
+
+class SyncWorker:
+    """Runs syncs one at a time, in a thread owned by the server.
+
+    Syncs outlive the script runs and sessions that submitted them. Submitting
+    while a sync is queued or running returns it rather than queuing another one.
+    """
+
+    def __init__(self, rate_limiter: QuotaRateLimiter) -> None:
+        self.rate_limiter = rate_limiter
+        self.lock = threading.Lock()
+        self.jobs: queue.Queue[tuple[StravaClient, SyncJob]] = queue.Queue()
+        self.last_job: SyncJob | None = None
+        threading.Thread(target=self._work, name="sync-worker", daemon=True).start()
+
+    def submit(self, strava_client: StravaClient, full: bool = False) -> SyncJob:
+        with self.lock:
+            if self.last_job is None or not self.last_job.is_active:
+                self.last_job = SyncJob(full=full)
+                self.jobs.put((strava_client, self.last_job))
+
+            return self.last_job
+
+    def _work(self) -> None:
+        while True:
+            strava_client, job = self.jobs.get()
+            job.status = "running"
+            try:
+                # Refreshed here and before every request of the sync, rather than
+                # by page reruns: the tab that submitted it may have been closed
+                refresh_strava_tokens_if_expired(strava_client)
+                sync(strava_client, self.rate_limiter, full=job.full, report=job.report)
+            except Exception as e:
+                job.status, job.message = "failed", f"Sync failed: {e!r}"
+            else:
+                job.status = "done"
+
+
+@st.cache_resource
+def get_sync_worker() -> SyncWorker:
+    return SyncWorker(rate_limiter=get_rate_limiter())
+
+
+def st_sync_status(poll_interval_s: float = 1.0) -> None:
+    """Shows the progress of the last sync, and reruns the page until it is over.
+
+    To be called last, as the rerun interrupts the script: pages call it at their
+    end, in their sidebar.
+    """
+    job = get_sync_worker().last_job
+    if job is None:
+        return
+
+    if job.status == "failed":
+        st.error(job.message)
+    elif job.status == "done":
+        st.success(job.message)
+    else:
+        st.info(job.message)
+        if job.n_total:
+            st.progress(
+                job.n_done / job.n_total, text=f"{job.n_done}/{job.n_total} activities"
+            )
+
+    for warning in job.warnings[-10:]:
+        st.warning(warning)
+
+    if job.is_active:
+        time.sleep(poll_interval_s)
+        st.rerun()
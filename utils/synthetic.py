@@ -0,0 +1,148 @@
+"""Synthetic athlete history, for offline runs of the app and for benchmarks.
+
+Activities are Strava-like summary JSON dicts; their streams are generated on
+demand and deterministically from the activity ID, so that large histories are
+cheap to list.
+"""
+import datetime
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from constants import VMA
+
+SYNTHETIC_ATHLETE = {
+    "id": 1,
+    "resource_state": 2,
+    "firstname": "Synthetic",
+    "lastname": "Runner",
+    "profile": "https://www.strava.com/images/avatar/athlete/large.png",
+    "city": "Paris",
+    "country": "France",
+    "sex": "M",
+}
+
+# kind: (probability, (min km, max km), speed ratio of VMA)
+ACTIVITY_KINDS = {
+    "Easy run": (0.5, (6, 12), 0.68),
+    "Long run": (0.15, (15, 32), 0.70),
+    "Tempo run": (0.15, (8, 14), 0.82),
+    "Intervals": (0.15, (8, 12), 0.75),
+    "Trail": (0.05, (10, 25), 0.58),
+}
+HOME_LATLNG = (48.8566, 2.3522)
+FIRST_ACTIVITY_ID = 10_000_000_000
+
+
+def generate_activities(
+    n_years: float = 3,
+    runs_per_week: float = 4,
+    end_date: datetime.date | None = None,
+    seed: int = 0,
+) -> list[dict[str, Any]]:
+    """Returns activity summaries, the way `GET /athlete/activities` does"""
+    rng = np.random.default_rng(seed)
+    end_date = end_date or datetime.date.today()
+    n_days = int(n_years * 365)
+    n_activities = min(round(n_years * 52 * runs_per_week), n_days)
+
+    days_ago = np.sort(rng.choice(n_days, size=n_activities, replace=False))[::-1]
+    kinds = rng.choice(
+        list(ACTIVITY_KINDS),
+        size=n_activities,
+        p=[probability for probability, _, _ in ACTIVITY_KINDS.values()],
+    )
+
+    activities = []
+    for i, (day_ago, kind) in enumerate(zip(days_ago, kinds)):
+        _, (min_km, max_km), vma_ratio = ACTIVITY_KINDS[kind]
+        distance = rng.uniform(min_km, max_km) * 1000
+        average_speed = VMA * vma_ratio * rng.normal(1, 0.03)
+        moving_time = int(distance / average_speed)
+        start_date = datetime.datetime.combine(
+            end_date - datetime.timedelta(days=int(day_ago)),
+            datetime.time(hour=int(rng.integers(6, 20)), minute=int(rng.integers(60))),
+            tzinfo=datetime.timezone.utc,
+        )
+
+        activities.append(
+            {
+                "id": FIRST_ACTIVITY_ID + i,
+                "resource_state": 2,
+                "athlete": {"id": SYNTHETIC_ATHLETE["id"], "resource_state": 1},
+                "name": kind,
+                "type": "Run",
+                "sport_type": "TrailRun" if kind == "Trail" else "Run",
+                "distance": round(distance, 1),
+                "moving_time": moving_time,
+                "elapsed_time": moving_time + int(rng.integers(0, 300)),
+                "total_elevation_gain": round(
+                    rng.uniform(20, 800 if kind == "Trail" else 150), 1
+                ),
+                "start_date": start_date.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "start_date_local": start_date.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "timezone": "(GMT+00:00) Europe/London",
+                "average_speed": round(average_speed, 3),
+                "max_speed": round(average_speed * 1.3, 3),
+                "average_cadence": round(rng.normal(86, 2), 1),
+                "average_heartrate": round(110 + 70 * vma_ratio + rng.normal(0, 3), 1),
+                "max_heartrate": float(int(175 + rng.integers(0, 15))),
+                "has_heartrate": True,
+                "kudos_count": int(rng.integers(0, 30)),
+                "manual": False,
+                "private": False,
+            }
+        )
+
+    return activities
+
+
+def _smooth(values: np.ndarray, window: int) -> np.ndarray:
+    return np.convolve(values, np.ones(window) / window, mode="same")
+
+
+def generate_streams_df(activity: dict[str, Any]) -> pd.DataFrame:
+    """Returns 1 Hz streams matching the activity summary (distance, duration)"""
+    rng = np.random.default_rng(activity["id"])
+    n_samples = max(activity["moving_time"], 2)
+    speed = np.full(n_samples, activity["average_speed"])
+
+    if activity["name"] == "Intervals":
+        is_fast = (np.arange(n_samples) // 90) % 2 == 1
+        speed = np.where(is_fast, VMA * rng.uniform(0.95, 1.1), speed * 0.85)
+    speed = speed * (1 + _smooth(rng.normal(0, 0.08, n_samples), 15))
+
+    is_moving = _smooth(rng.random(n_samples) < 0.002, 20) == 0
+    speed = np.where(is_moving, np.clip(speed, 0.5, None), 0)
+    velocity_smooth = _smooth(speed, 5)
+    velocity_smooth *= activity["distance"] / velocity_smooth.sum()
+
+    heartrate = (
+        pd.Series(60 + 110 * speed / VMA + rng.normal(0, 2, n_samples))
+        .ewm(span=30)
+        .mean()
+        .clip(60, 205)
+    )
+    heading = np.cumsum(rng.normal(0, 0.05, n_samples))
+    latitude = HOME_LATLNG[0] + np.cumsum(velocity_smooth * np.cos(heading)) / 111_320
+    longitude = HOME_LATLNG[1] + np.cumsum(velocity_smooth * np.sin(heading)) / (
+        111_320 * np.cos(np.radians(HOME_LATLNG[0]))
+    )
+    cadence = np.where(
+        is_moving, activity["average_cadence"] + rng.normal(0, 2, n_samples), 0
+    )
+
+    return pd.DataFrame(
+        {
+            "distance": np.cumsum(velocity_smooth).round(1),
+            "time": np.arange(n_samples),
+            "heartrate": heartrate.round().astype(int),
+            "cadence": cadence.round().astype(int),
+            "velocity_smooth": velocity_smooth.round(3),
+            "altitude": (50 + np.cumsum(rng.normal(0, 0.3, n_samples))).round(1),
+            "latitude": latitude.round(6),
+            "longitude": longitude.round(6),
+            "moving": is_moving,
+        }
+    )
@@ -0,0 +1,67 @@
+import datetime
+import os
+from typing import Any
+
+import yaml
+
+from constants import DATA_PATH
+
+TARGETS_FILEPATH = DATA_PATH / "targets.yaml"
+
+# Burn-up targets by label: a distance to run over a period, excluded periods
+# (injuries, holidays) not counting
+Target = dict[str, Any]
+
+DEFAULT_TARGETS: dict[str, Target] = {
+    "2025": {
+        "target_km": 4000,
+        "start_date": datetime.date(2025, 1, 1),
+        "end_date": datetime.date(2025, 12, 31),
+        "exclude": [],
+    },
+    "2024": {
+        "target_km": 2200,
+        "start_date": datetime.date(2024, 1, 1),
+        "end_date": datetime.date(2024, 12, 31),
+        "exclude": [
+            {
+                "start_date": datetime.date(2024, 1, 29),
+                "end_date": datetime.date(2024, 3, 1),
+            },
+            {
+                "start_date": datetime.date(2024, 6, 1),
+                "end_date": datetime.date(2024, 7, 1),
+            },
+        ],
+    },
+    "2023": {
+        "target_km": 2600,
+        "start_date": datetime.date(2023, 1, 1),
+        "end_date": datetime.date(2023, 12, 31),
+        "exclude": [
+            {
+                "start_date": datetime.date(2023, 7, 31),
+                "end_date": datetime.date(2023, 8, 20),
+            },
+        ],
+    },
+}
+
+
+def load_targets() -> dict[str, Target]:
+    """Targets saved from the burn-up page, the default ones until then"""
+    if not TARGETS_FILEPATH.exists():
+        return DEFAULT_TARGETS
+
+    # Emptied by hand, the file has no target left to select
+    with open(TARGETS_FILEPATH) as f:
+        return yaml.safe_load(f) or DEFAULT_TARGETS
+
+
+def save_targets(targets: dict[str, Target]) -> None:
+    """Writes targets, replacing the file atomically"""
+    DATA_PATH.mkdir(exist_ok=True)
+    tmp_filepath = TARGETS_FILEPATH.with_suffix(".yaml.tmp")
+    with open(tmp_filepath, "w") as f:
+        yaml.safe_dump(targets, f, sort_keys=False)
+    os.replace(tmp_filepath, TARGETS_FILEPATH)
@@ -1,11 +1,21 @@
-from constants import VMA
+import numpy as np
+import pandas as pd
 
-SPEED_ZONE_1_2 = 0.61 * VMA  # Z1 = EF
-SPEED_ZONE_2_3 = 0.75 * VMA  # Z2 = Footing
-SPEED_ZONE_3_4 = 0.85 * VMA  # Z3 = Seuil Anaerobie
-SPEED_ZONE_4_5 = 0.92 * VMA  # Z4 = AS 10
-SPEED_ZONE_5_6 = 0.97 * VMA  # Z5 = VMA Longue
-SPEED_ZONE_6_7 = 1.05 * VMA  # Z6 = VMA Moy / Z7 = VM Courte
+SPEED_ZONE_VMA_RATIOS = (
+    0.61,  # Z1 = EF
+    0.75,  # Z2 = Footing
+    0.85,  # Z3 = Seuil Anaerobie
+    0.92,  # Z4 = AS 10
+    0.97,  # Z5 = VMA Longue
+    1.05,  # Z6 = VMA Moy / Z7 = VM Courte
+)
+
+
+def get_speed_zone_boundaries(
+    vma: float, vma_ratios: tuple[float, ...] = SPEED_ZONE_VMA_RATIOS
+) -> tuple[float, ...]:
+    """Returns the speeds (m.s-1) separating two consecutive zones"""
+    return tuple(ratio * vma for ratio in vma_ratios)
 
 
 def format_speed_ms_to_per_km_str(speed_in_ms: int | float) -> str:
@@ -20,27 +30,35 @@ def format_speed_ms_to_per_km_str(speed_in_ms: int | float) -> str:
     return f"{minutes}:{seconds:02}"
 
 
-SPEED_ZONE_1_2_STR = format_speed_ms_to_per_km_str(SPEED_ZONE_1_2)
-SPEED_ZONE_2_3_STR = format_speed_ms_to_per_km_str(SPEED_ZONE_2_3)
-SPEED_ZONE_3_4_STR = format_speed_ms_to_per_km_str(SPEED_ZONE_3_4)
-SPEED_ZONE_4_5_STR = format_speed_ms_to_per_km_str(SPEED_ZONE_4_5)
-SPEED_ZONE_5_6_STR = format_speed_ms_to_per_km_str(SPEED_ZONE_5_6)
-SPEED_ZONE_6_7_STR = format_speed_ms_to_per_km_str(SPEED_ZONE_6_7)
-
-
-def get_speed_zone_label(speed_in_ms: int | float) -> str:
-    match speed_in_ms:
-        case speed_in_ms if speed_in_ms > SPEED_ZONE_6_7:
-            return f"Z7 (> {SPEED_ZONE_6_7_STR})"
-        case speed_in_ms if speed_in_ms > SPEED_ZONE_5_6:
-            return f"Z6 ({SPEED_ZONE_5_6_STR}-{SPEED_ZONE_6_7_STR})"
-        case speed_in_ms if speed_in_ms > SPEED_ZONE_4_5:
-            return f"Z5 ({SPEED_ZONE_4_5_STR}-{SPEED_ZONE_5_6_STR})"
-        case speed_in_ms if speed_in_ms > SPEED_ZONE_3_4:
-            return f"Z4 ({SPEED_ZONE_3_4_STR}-{SPEED_ZONE_4_5_STR})"
-        case speed_in_ms if speed_in_ms > SPEED_ZONE_2_3:
-            return f"Z3 ({SPEED_ZONE_2_3_STR}-{SPEED_ZONE_3_4_STR})"
-        case speed_in_ms if speed_in_ms > SPEED_ZONE_1_2:
-            return f"Z2 ({SPEED_ZONE_1_2_STR}-{SPEED_ZONE_2_3_STR})"
-        case _:
-            return f"Z1 (<{SPEED_ZONE_1_2_STR})"
+def get_speed_zone_labels(boundaries: tuple[float, ...]) -> list[str]:
+    boundaries_str = [format_speed_ms_to_per_km_str(speed) for speed in boundaries]
+
+    return [
+        f"Z1 (<{boundaries_str[0]})",
+        *[
+            f"Z{zone} ({lower_str}-{upper_str})"
+            for zone, (lower_str, upper_str) in enumerate(
+                zip(boundaries_str[:-1], boundaries_str[1:]), start=2
+            )
+        ],
+        f"Z{len(boundaries) + 1} (> {boundaries_str[-1]})",
+    ]
+
+
+def get_speed_zones(
+    speeds_in_ms: pd.Series, boundaries: tuple[float, ...]
+) -> pd.Series:
+    """Bins speeds into an ordered categorical of zone labels.
+
+    A speed equal to a boundary falls in the lower zone, missing speeds in Z1.
+    """
+    codes = np.searchsorted(boundaries, speeds_in_ms.to_numpy(), side="left")
+    codes[np.isnan(speeds_in_ms.to_numpy())] = 0
+
+    return pd.Series(
+        pd.Categorical.from_codes(
+            codes, categories=get_speed_zone_labels(boundaries), ordered=True
+        ),
+        index=speeds_in_ms.index,
+        name="speed_zone",
+    )
@@ -1,20 +1,34 @@
 import streamlit as st
 
-from utils.data_cache import load_data_from_cache, update_cache
-from utils.strava import get_strava_client, st_strava_authorization_button
+from utils.athlete import get_vma_kmh, save_athlete_settings
+from utils.data_cache import (
+    get_cache_memory_usage,
+    get_cache_streams_count,
+    load_activities_from_cache,
+)
+from utils.strava import (
+    get_strava_athlete,
+    get_strava_client,
+    st_strava_authorization_button,
+)
+from utils.sync_worker import get_sync_worker, st_sync_status
 
 
 st.set_page_config(
     page_icon=":running:", page_title="Streamlit data app", layout="wide"
 )
 
-activities_df, streams_df = load_data_from_cache()
+activities_df = load_activities_from_cache()
 
 st.title("Strava Data App")
 
 st_cols = st.columns([2, 2, 3, 3, 3])
 st_cols[0].metric(label="Activities", value=len(activities_df))
-st_cols[1].metric(label="Point of data", value=len(streams_df))
+st_cols[1].metric(
+    label="Point of data",
+    value=get_cache_streams_count() or "-",
+    help="Streams are loaded by the first page needing them",
+)
 st_cols[2].metric(
     label="Last activity",
     value=(
@@ -37,6 +51,32 @@ st_cols[4].metric(
         else f"{activities_df.moving_time.sum() / 3600:.2f} hours"
     ),
 )
+
+with st.expander("💾 Memory usage"):
+    memory_usage_df = get_cache_memory_usage()
+    st.metric(
+        label="Cached frames", value=f"{memory_usage_df.bytes.sum() / 2**20:.1f} MB"
+    )
+    st.dataframe(
+        memory_usage_df.assign(megabytes=lambda df: df.bytes / 2**20),
+        column_config={"megabytes": st.column_config.NumberColumn(format="%.2f MB")},
+        hide_index=True,
+        use_container_width=True,
+    )
+
+st.write("---")
+
+# % --- Athlete settings
+st.write("### ⚙️ Athlete settings")
+
+vma_kmh = get_vma_kmh()
+selected_vma_kmh = st.number_input(
+    label="VMA (km/h)", min_value=8.0, max_value=30.0, value=float(vma_kmh), step=0.1
+)
+if selected_vma_kmh != vma_kmh:
+    save_athlete_settings(vma_kmh=selected_vma_kmh)
+    st.rerun()
+
 st.write("---")
 
 # % --- Refresh data
@@ -55,7 +95,7 @@ with st_status_col:
 
 with st_action_col:
     if strava_user_is_logged_in:
-        athlete = strava_client.get_athlete()
+        athlete = get_strava_athlete(strava_client.access_token)
         st_action_col.markdown(
             f"""
 <div style='display: inline;'>
@@ -71,7 +111,21 @@ with st_action_col:
             label="Authorize Strava", redirect_uri="http://localhost:8501"
         )
 
-if st.button(
-    label="Download activities", disabled=not strava_user_is_logged_in, type="primary"
-):
-    update_cache()
+full_sync = st.checkbox(
+    label="Full sync",
+    help="Also removes activities deleted from Strava, and downloads edited ones "
+    "again. Otherwise, only activities started after the last synced one are listed.",
+)
+sync_worker = get_sync_worker()
+sync_is_active = sync_worker.last_job is not None and sync_worker.last_job.is_active
+# A callback, so that the polling reruns do not submit the sync again
+st.button(
+    label="Download activities",
+    disabled=not strava_user_is_logged_in or sync_is_active,
+    type="primary",
+    on_click=sync_worker.submit,
+    args=(strava_client,),
+    kwargs={"full": full_sync},
+)
+
+st_sync_status()